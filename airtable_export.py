@@ -9,6 +9,8 @@ from typing import Dict, List, Optional
 import httpx
 from dotenv import load_dotenv
 
+from http_pool import borrow_client
+
 load_dotenv()
 
 AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY", "").strip('"')
@@ -16,6 +18,7 @@ AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID", "").strip('"')
 TABLE_NAME = "Retailer Prospects"
 AIRTABLE_URL = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{TABLE_NAME}"
 META_URL = f"https://api.airtable.com/v0/meta/bases/{AIRTABLE_BASE_ID}/tables"
+TIMEOUT = 30.0
 BATCH_SIZE = 10
 RATE_DELAY = 0.25  # seconds between batches
 
@@ -85,7 +88,7 @@ TABLE_SCHEMA = {
 async def _ensure_table_exists(client: httpx.AsyncClient) -> bool:
     """Check if table exists, create if not. Returns True if ready."""
     # Try listing tables to see if ours exists
-    resp = await client.get(META_URL, headers=_headers())
+    resp = await client.get(META_URL, headers=_headers(), timeout=TIMEOUT)
     if resp.status_code != 200:
         # Try creating anyway
         pass
@@ -96,7 +99,7 @@ async def _ensure_table_exists(client: httpx.AsyncClient) -> bool:
                 return True  # Already exists
 
     # Create the table
-    resp = await client.post(META_URL, headers=_headers(), json=TABLE_SCHEMA)
+    resp = await client.post(META_URL, headers=_headers(), json=TABLE_SCHEMA, timeout=TIMEOUT)
     if resp.status_code in (200, 201):
         return True
     # If 422, table might already exist (race condition)
@@ -165,7 +168,7 @@ async def _fetch_existing(client: httpx.AsyncClient) -> Dict[str, str]:
         params = {"pageSize": "100"}
         if offset:
             params["offset"] = offset
-        resp = await client.get(AIRTABLE_URL, headers=_headers(), params=params)
+        resp = await client.get(AIRTABLE_URL, headers=_headers(), params=params, timeout=TIMEOUT)
         if resp.status_code in (404, 403, 422):
             return {}
         resp.raise_for_status()
@@ -184,11 +187,12 @@ async def export_to_airtable(
     stores: List[dict],
     enrichments: Optional[Dict[int, dict]] = None,
     callback=None,
+    client: httpx.AsyncClient | None = None,
 ) -> dict:
     """Push stores to Airtable. Returns summary stats."""
     stats = {"created": 0, "updated": 0, "errors": 0, "total": len(stores)}
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with borrow_client(client) as client:
         # Ensure table exists
         if not await _ensure_table_exists(client):
             raise RuntimeError("Could not create or find Airtable table")
@@ -221,6 +225,7 @@ async def export_to_airtable(
                     AIRTABLE_URL,
                     headers=_headers(),
                     json={"records": batch, "typecast": True},
+                    timeout=TIMEOUT,
                 )
                 resp.raise_for_status()
                 stats["created"] += len(batch)
@@ -238,6 +243,7 @@ async def export_to_airtable(
                     AIRTABLE_URL,
                     headers=_headers(),
                     json={"records": batch, "typecast": True},
+                    timeout=TIMEOUT,
                 )
                 resp.raise_for_status()
                 stats["updated"] += len(batch)
@@ -0,0 +1,55 @@
+"""Serverless function — search-as-you-type store lookup by name/city/state prefix."""
+import os
+import sys
+import json
+from http.server import BaseHTTPRequestHandler
+import urllib.parse
+
+# Add parent dir to path so we can import store_search
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from store_search import AUTOCOMPLETE_FIELDS, StoreAutocomplete
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data.json")
+
+# Index kept for the life of a warm instance, rebuilt if data.json changes
+_index = None
+
+
+def _load_index():
+    """Return (stores, StoreAutocomplete) for the current data.json."""
+    global _index
+    st = os.stat(DATA_PATH)
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _index is None or _index[0] != stamp:
+        with open(DATA_PATH) as f:
+            data = json.load(f)
+        _index = (stamp, data, StoreAutocomplete(data))
+    return _index[1], _index[2]
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            q = params.get("q", [""])[0]
+            limit = max(0, min(int(params.get("limit", ["10"])[0]), 50))
+            data, index = _load_index()
+            rows = [
+                [i, *(data[i].get(f) for f in AUTOCOMPLETE_FIELDS[1:])]
+                for i in index.complete(q, limit)
+            ]
+            if params.get("format", [""])[0] == "compact":
+                result = {"fields": AUTOCOMPLETE_FIELDS, "rows": rows}
+            else:
+                result = {"stores": [dict(zip(AUTOCOMPLETE_FIELDS, row)) for row in rows]}
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(json.dumps(result).encode())
+        except Exception as e:
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
@@ -7,7 +7,23 @@ from http.server import BaseHTTPRequestHandler
 
 # Add parent dir to path so we can import dealer_scraper
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+# The deployment filesystem is read-only apart from /tmp
+os.environ.setdefault("DEALER_CACHE_DB", "/tmp/dealer_cache.db")
 from dealer_scraper import find_brand_dealers
+from store_linkage import StoreLinker
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data.json")
+
+# Linker kept for the life of a warm instance
+_linker = None
+
+
+def _store_linker():
+    global _linker
+    if _linker is None:
+        with open(DATA_PATH) as f:
+            _linker = StoreLinker(json.load(f))
+    return _linker
 
 
 class handler(BaseHTTPRequestHandler):
@@ -19,8 +35,10 @@ class handler(BaseHTTPRequestHandler):
             query = body.get("query", "")
             brand = body.get("brand", "")
             url = body.get("url", "")
+            refresh = bool(body.get("refresh"))
 
-            result = asyncio.run(find_brand_dealers(query=query, brand=brand, url=url))
+            result = asyncio.run(find_brand_dealers(query=query, brand=brand, url=url, refresh=refresh))
+            _store_linker().annotate(result["dealers"])
 
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
@@ -1,10 +1,14 @@
 """Serverless function for prospect list management — backed by Airtable."""
 import os
+import sys
 import json
 from http.server import BaseHTTPRequestHandler
 import urllib.request
 import urllib.parse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from store_search import StoreSearchIndex
+
 AIRTABLE_API_KEY = os.environ.get("AIRTABLE_API_KEY", "")
 AIRTABLE_BASE_ID = os.environ.get("AIRTABLE_BASE_ID", "")
 TABLE_NAME = "Retailer Prospects"
@@ -94,13 +98,30 @@ def _get_prospects_for_list(list_name):
     return records
 
 
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data.json")
+
+
 def _load_data():
     """Load data.json for index-to-name mapping."""
-    data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data.json")
-    with open(data_path) as f:
+    with open(DATA_PATH) as f:
         return json.load(f)
 
 
+# Search index kept for the life of a warm instance, rebuilt if data.json changes
+_search = None
+
+
+def _load_search_index():
+    """Return (stores, StoreSearchIndex) for the current data.json."""
+    global _search
+    st = os.stat(DATA_PATH)
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _search is None or _search[0] != stamp:
+        data = _load_data()
+        _search = (stamp, data, StoreSearchIndex(data))
+    return _search[1], _search[2]
+
+
 def _find_or_create_records(store_indices, list_name, referral_source=None):
     """Add stores to a list. Creates records if they don't exist in Airtable."""
     data = _load_data()
@@ -263,23 +284,18 @@ class handler(BaseHTTPRequestHandler):
                 if len(q) < 2:
                     self._send_json(400, {"error": "Query must be at least 2 characters"})
                     return
-                data = _load_data()
+                data, index = _load_search_index()
                 results = []
-                for i, store in enumerate(data):
-                    if len(results) >= limit:
-                        break
-                    name = (store.get("name") or "").lower()
-                    city = (store.get("city") or "").lower()
-                    state = (store.get("state") or "").lower()
-                    if q in name or q in city or q in state:
-                        results.append({
-                            "idx": i,
-                            "name": store.get("name", ""),
-                            "city": store.get("city", ""),
-                            "state": store.get("state", ""),
-                            "rating": store.get("rating"),
-                            "store_type": store.get("store_type", ""),
-                        })
+                for i in index.search(q, limit):
+                    store = data[i]
+                    results.append({
+                        "idx": i,
+                        "name": store.get("name", ""),
+                        "city": store.get("city", ""),
+                        "state": store.get("state", ""),
+                        "rating": store.get("rating"),
+                        "store_type": store.get("store_type", ""),
+                    })
                 self._send_json(200, {"stores": results})
             else:
                 self._send_json(400, {"error": f"Unknown action: {action}"})
@@ -0,0 +1,204 @@
+"""Brand lookup: single-pass multi-brand matcher (Aho-Corasick) and query resolver."""
+from __future__ import annotations
+
+import difflib
+import json
+import re
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_WORD_RE = re.compile(r'^[\w]+$')
+
+
+def _surface_forms(name: str) -> List[str]:
+    """Spellings matched for one brand name: as written, plus joined and
+    dashed forms for multi-word names ("Rad Power" -> "RadPower", "Rad-Power")."""
+    forms = [name]
+    words = name.split()
+    if len(words) > 1 and all(_WORD_RE.match(w) for w in words):
+        forms.append("".join(words))
+        forms.append("-".join(words))
+    return forms
+
+
+def _canonical_names(
+    brands: Iterable[str],
+    aliases: Optional[Dict[str, str]] = None,
+    brands_file: Optional[Path] = None,
+) -> Dict[str, List[str]]:
+    """{canonical: [alias, ...]} from brand names, an {alias: canonical} map
+    and an optional brands file (see BrandMatcher.from_brands)."""
+    canon: Dict[str, List[str]] = {}
+    aliases = dict(aliases or {})
+    for name in brands:
+        if name in aliases:
+            canon.setdefault(aliases[name], [])
+        else:
+            canon.setdefault(name, [])
+    for alias, name in aliases.items():
+        canon.setdefault(name, []).append(alias)
+
+    if brands_file is not None and Path(brands_file).exists():
+        try:
+            extra = json.loads(Path(brands_file).read_text())
+        except (json.JSONDecodeError, OSError):
+            extra = {}
+        if isinstance(extra, list):
+            extra = {name: [] for name in extra}
+        for name, names in extra.items():
+            canon.setdefault(name, []).extend(names)
+    return canon
+
+
+class BrandMatcher:
+    """Reports every brand whose name (or alias) occurs in a text, in one scan.
+
+    Matching is case-insensitive substring matching, the same semantics as
+    the per-brand re.search(re.escape(brand), re.I) it replaces. The
+    automaton is built once; scan cost is linear in the text regardless of
+    how many brands are loaded.
+    """
+
+    def __init__(self, forms: Dict[str, str]):
+        """forms maps each surface spelling to its canonical brand name."""
+        goto: List[dict] = [{}]
+        fail: List[int] = [0]
+        out: List[tuple] = [()]
+
+        for form, canonical in forms.items():
+            node = 0
+            for ch in form.lower():
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                node = nxt
+            if canonical not in out[node]:
+                out[node] += (canonical,)
+
+        # Breadth-first failure links; fold suffix outputs into each node
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += tuple(c for c in out[fail[nxt]] if c not in out[nxt])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self.brands = sorted(set(forms.values()))
+
+    @classmethod
+    def from_brands(
+        cls,
+        brands: Iterable[str],
+        aliases: Optional[Dict[str, str]] = None,
+        brands_file: Optional[Path] = None,
+    ) -> "BrandMatcher":
+        """Build from canonical names, an {alias: canonical} map and an optional
+        JSON file of {canonical: [alias, ...]} (or a plain list of names)."""
+        forms: Dict[str, str] = {}
+        for name, names in _canonical_names(brands, aliases, brands_file).items():
+            for spelling in [name, *names]:
+                for form in _surface_forms(spelling):
+                    forms.setdefault(form, name)
+        return cls(forms)
+
+    def find(self, text: str) -> Set[str]:
+        """Return the set of canonical brands occurring anywhere in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+# ── Query resolution ──────────────────────────────────────────────────────────
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+# Spelling-based matches of words shorter than this need SHORT_FUZZY_RATIO:
+# one letter off in four is common between unrelated words ("tire"/"trek")
+SHORT_FUZZY_LENGTH = 5
+SHORT_FUZZY_RATIO = 0.85
+
+
+def _tokens(text: str) -> List[str]:
+    """Lowercase, accent-free alphanumeric words; "and" is dropped so it
+    matches "&" ("Riese and Muller" -> ["riese", "muller"])."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return [w for w in _NON_ALNUM_RE.sub(" ", text).split() if w != "and"]
+
+
+class BrandResolver:
+    """Picks the brand a free-text query is about, without a network call.
+
+    Every canonical name and alias is indexed by its tokens joined without
+    spaces ("Rad Power", "RadPower" and "rad-power" are all "radpower"),
+    and every run of up to max_words query words is looked up the same
+    way. An exact hit resolves with full confidence; otherwise the closest
+    spelling is found with difflib and its similarity is the confidence
+    (short words only count when they are very close).
+    """
+
+    def __init__(self, names: Dict[str, List[str]], stop_words: Iterable[str] = ()):
+        self._forms: Dict[str, str] = {}
+        self._max_words = 1
+        for name, aliases in names.items():
+            for spelling in [name, *aliases]:
+                tokens = _tokens(spelling)
+                if tokens:
+                    self._forms.setdefault("".join(tokens), name)
+                    # Queries may split a name further ("Ride1Up" -> "ride 1 up")
+                    self._max_words = max(self._max_words, len(tokens) + 2)
+        self._stop_words = {w.lower() for w in stop_words}
+
+    @classmethod
+    def from_brands(
+        cls,
+        brands: Iterable[str],
+        aliases: Optional[Dict[str, str]] = None,
+        brands_file: Optional[Path] = None,
+        stop_words: Iterable[str] = (),
+    ) -> "BrandResolver":
+        return cls(_canonical_names(brands, aliases, brands_file), stop_words)
+
+    def _runs(self, words: List[str]):
+        """(start, length, joined) for each run of up to max_words words, longest first."""
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                yield i, n, "".join(words[i:i + n])
+
+    def resolve(self, query: str) -> Tuple[Optional[str], float]:
+        """Return (canonical brand or None, confidence in [0, 1])."""
+        words = _tokens(query)
+        exact = [(i, name) for i, _, run in self._runs(words) if (name := self._forms.get(run))]
+        if exact:
+            names = {name for _, name in exact}
+            # Several different brands named: take the first, slightly less sure
+            return min(exact)[1], 1.0 if len(names) == 1 else 0.9
+
+        content = [w for w in words if w not in self._stop_words]
+        best, best_ratio = None, 0.0
+        for _, _, run in self._runs(content):
+            for form in difflib.get_close_matches(run, self._forms, n=1, cutoff=max(best_ratio, 0.6)):
+                ratio = difflib.SequenceMatcher(None, run, form).ratio()
+                if len(run) < SHORT_FUZZY_LENGTH and ratio < SHORT_FUZZY_RATIO:
+                    continue
+                if ratio > best_ratio:
+                    best, best_ratio = self._forms[form], ratio
+        return best, best_ratio
@@ -4,12 +4,25 @@ from __future__ import annotations
 import os
 import re
 import json
+import math
+import time
 import asyncio
+from collections import OrderedDict
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
 import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+try:
+    import anthropic
+except ImportError:  # optional: the LLM steps are skipped without it
+    anthropic = None
+
+from brand_matcher import BrandResolver
+from enrichment_cache import EnrichmentCache
+from http_pool import borrow_client
+from scraper import BRAND_ALIASES, BRANDS_FILE, KNOWN_BRANDS
 
 # ── Configuration ─────────────────────────────────────────────────────────────
 TIMEOUT = 8.0
@@ -21,6 +34,16 @@ HEADERS = {
 
 BASE_DIR = Path(__file__).parent
 BRAND_URLS_FILE = BASE_DIR / "brand_dealer_urls.json"
+DEALER_CACHE_DB = Path(os.environ.get("DEALER_CACHE_DB", BASE_DIR / "dealer_cache.db"))
+DEALER_CACHE_TTL = int(os.environ.get("DEALER_CACHE_TTL", 24 * 3600))
+DEALER_ERROR_TTL = 600  # failed lookups (no locator, nothing extracted) are retried sooner
+
+# LLM calls: hard per-call deadlines (seconds). ANTHROPIC_BASE_URL points the
+# client at another endpoint, e.g. a local stand-in server for testing.
+LLM_MODEL = "claude-haiku-4-5-20251001"
+LLM_BASE_URL = os.environ.get("ANTHROPIC_BASE_URL") or None
+BRAND_LLM_TIMEOUT = float(os.environ.get("BRAND_LLM_TIMEOUT", "5"))
+EXTRACT_LLM_TIMEOUT = float(os.environ.get("EXTRACT_LLM_TIMEOUT", "30"))
 
 def _load_brand_urls() -> dict:
     if BRAND_URLS_FILE.exists():
@@ -28,32 +51,91 @@ def _load_brand_urls() -> dict:
     return {}
 
 
-# ── Brand extraction via Claude ───────────────────────────────────────────────
-def extract_brand_from_query(query: str) -> str:
-    """Use Claude Haiku to extract the brand name from a natural language query."""
-    api_key = os.environ.get("ANTHROPIC_API_KEY", "")
-    if not api_key:
+# ── Brand extraction ──────────────────────────────────────────────────────────
+# Local matches at or above this confidence skip the LLM
+LOCAL_BRAND_CONFIDENCE = 0.85
+# Without an LLM answer, a fuzzy local match still beats stop-word stripping
+FUZZY_BRAND_CONFIDENCE = 0.75
+
+_brand_resolver: BrandResolver | None = None
+
+
+def _get_brand_resolver() -> BrandResolver:
+    """Resolver over brand_dealer_urls.json keys plus scraper's known brands."""
+    global _brand_resolver
+    if _brand_resolver is None:
+        _brand_resolver = BrandResolver.from_brands(
+            [*_load_brand_urls(), *KNOWN_BRANDS], BRAND_ALIASES, BRANDS_FILE, _STOP_WORDS,
+        )
+    return _brand_resolver
+
+
+async def _llm_complete(prompt: str, max_tokens: int, timeout: float) -> str:
+    """Send one user prompt to Claude Haiku and return the reply text.
+
+    Runs on the async client and is cancelled once `timeout` seconds pass,
+    raising asyncio.TimeoutError, so a slow response never holds up the
+    event loop or the request waiting on it.
+    """
+    if anthropic is None:
+        raise RuntimeError("anthropic package is not installed")
+    async with anthropic.AsyncAnthropic(
+        api_key=os.environ.get("ANTHROPIC_API_KEY", ""),
+        base_url=LLM_BASE_URL,
+        timeout=timeout,
+        max_retries=0,
+    ) as llm:
+        resp = await asyncio.wait_for(
+            llm.messages.create(
+                model=LLM_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+            ),
+            timeout,
+        )
+    return resp.content[0].text
+
+
+async def extract_brand_from_query(query: str, refresh: bool = False) -> str:
+    """Extract the brand name from a natural language query.
+
+    Known brands and aliases (including near-misspellings) are resolved
+    locally. Claude Haiku is only asked when the local match is unsure
+    (bounded by BRAND_LLM_TIMEOUT), and its answers are memoized in the
+    dealer result cache for DEALER_CACHE_TTL; refresh=True asks again.
+    """
+    local, confidence = _get_brand_resolver().resolve(query)
+    if local and confidence >= LOCAL_BRAND_CONFIDENCE:
+        return local
+
+    def fallback() -> str:
+        if local and confidence >= FUZZY_BRAND_CONFIDENCE:
+            return local
         return _extract_brand_fallback(query)
 
+    key = "query:" + " ".join(query.lower().split())
+    memo = None if refresh else _get_result_cache().get(key)
+    if memo is not None and time.time() - memo["timestamp"] < DEALER_CACHE_TTL:
+        return memo["data"]["brand"]
+
+    if not os.environ.get("ANTHROPIC_API_KEY", ""):
+        return fallback()
+
     try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=api_key)
-        resp = client.messages.create(
-            model="claude-haiku-4-5-20251001",
+        text = await _llm_complete(
+            "Extract ONLY the brand/company name from this dealer search query. "
+            "Return just the brand name, nothing else. No punctuation, no explanation.\n\n"
+            f"Query: \"{query}\"",
             max_tokens=100,
-            messages=[{
-                "role": "user",
-                "content": (
-                    "Extract ONLY the brand/company name from this dealer search query. "
-                    "Return just the brand name, nothing else. No punctuation, no explanation.\n\n"
-                    f"Query: \"{query}\""
-                ),
-            }],
+            timeout=BRAND_LLM_TIMEOUT,
         )
-        brand = resp.content[0].text.strip().strip('"\'.')
-        return brand if brand else _extract_brand_fallback(query)
+        brand = text.strip().strip('"\'.')
     except Exception:
-        return _extract_brand_fallback(query)
+        return fallback()
+    if not brand:
+        return fallback()
+    _get_result_cache().set(key, {"brand": brand})
+    return brand
 
 
 _STOP_WORDS = {
@@ -75,9 +157,55 @@ def _extract_brand_fallback(query: str) -> str:
 
 
 # ── Dealer locator URL discovery ──────────────────────────────────────────────
-async def find_dealer_locator(brand: str) -> tuple[str | None, str]:
+PROBE_TIMEOUT = 5.0
+# Guessed domains that failed to connect (usually: don't resolve) are skipped
+# for a while; bounded, oldest evicted first
+NEGATIVE_HOST_TTL = 3600
+NEGATIVE_HOST_MAX = 512
+_bad_hosts: OrderedDict[str, float] = OrderedDict()
+
+
+def _host_is_bad(host: str) -> bool:
+    expires = _bad_hosts.get(host)
+    if expires is None:
+        return False
+    if expires <= time.time():
+        del _bad_hosts[host]
+        return False
+    return True
+
+
+def _mark_host_bad(host: str):
+    _bad_hosts[host] = time.time() + NEGATIVE_HOST_TTL
+    _bad_hosts.move_to_end(host)
+    while len(_bad_hosts) > NEGATIVE_HOST_MAX:
+        _bad_hosts.popitem(last=False)
+
+
+async def _probe_homepage(client: httpx.AsyncClient, url: str) -> str | None:
+    """Fetch a guessed brand homepage and return its dealer locator link, if any."""
+    host = urlparse(url).hostname or ""
+    if _host_is_bad(host):
+        return None
+    try:
+        resp = await client.get(url, timeout=PROBE_TIMEOUT, headers=HEADERS, follow_redirects=True)
+    except httpx.ConnectError:
+        _mark_host_bad(host)
+        return None
+    except Exception:
+        return None
+    if resp.status_code != 200:
+        return None
+    soup = BeautifulSoup(resp.text, "lxml")
+    return _find_dealer_link(soup, str(resp.url))
+
+
+async def find_dealer_locator(brand: str, client: httpx.AsyncClient | None = None) -> tuple[str | None, str]:
     """Find the dealer locator URL for a brand.
     Returns (url, type) where type is 'stockist', 'storerocket', 'storepoint', 'html', or 'auto'.
+
+    Guessed homepages are probed concurrently; the first one that yields
+    a dealer link wins and the other probes are cancelled.
     """
     brand_urls = _load_brand_urls()
 
@@ -90,27 +218,25 @@ async def find_dealer_locator(brand: str) -> tuple[str | None, str]:
     clean = re.sub(r'[^a-zA-Z0-9\s]', '', brand).strip()
     nospaces = clean.replace(' ', '').lower()
     dashed = clean.replace(' ', '-').lower()
-    domains_to_try = [
+    domains_to_try = list(dict.fromkeys([
         f"https://www.{nospaces}.com",
         f"https://{nospaces}.com",
         f"https://www.{dashed}.com",
         f"https://{dashed}.com",
         f"https://www.{nospaces}bikes.com",
         f"https://www.{nospaces}ebikes.com",
-    ]
+    ]))
 
-    async with httpx.AsyncClient(timeout=5.0, follow_redirects=True, headers=HEADERS, verify=False) as client:
-        for domain in domains_to_try:
-            try:
-                resp = await client.get(domain)
-                if resp.status_code != 200:
-                    continue
-                soup = BeautifulSoup(resp.text, "lxml")
-                dealer_url = _find_dealer_link(soup, str(resp.url))
+    async with borrow_client(client, verify=False) as client:
+        probes = [asyncio.create_task(_probe_homepage(client, domain)) for domain in domains_to_try]
+        try:
+            for probe in asyncio.as_completed(probes):
+                dealer_url = await probe
                 if dealer_url:
                     return dealer_url, "auto"
-            except Exception:
-                continue
+        finally:
+            for probe in probes:
+                probe.cancel()
 
     return None, "unknown"
 
@@ -137,26 +263,33 @@ def _find_dealer_link(soup: BeautifulSoup, base_url: str) -> str | None:
 
 
 # ── Multi-strategy dealer scraper ─────────────────────────────────────────────
-async def scrape_dealers(url: str, brand: str = "") -> dict:
+async def scrape_dealers(url: str, brand: str = "", client: httpx.AsyncClient | None = None) -> dict:
     """Scrape dealers from a dealer locator page.
     Returns {dealers: [...], strategy: str, source_url: str, error: str|None}.
     """
+    # Held open across every strategy: the locator page is fetched without
+    # TLS verification (store sites), the embed APIs with it. An injected
+    # client serves both.
+    async with borrow_client(client, verify=False) as site, borrow_client(client) as api:
+        return await _scrape_dealers(url, brand, site, api)
+
+
+async def _scrape_dealers(url: str, brand: str, site: httpx.AsyncClient, api: httpx.AsyncClient) -> dict:
     result = {"dealers": [], "strategy": "none", "source_url": url, "error": None}
 
-    async with httpx.AsyncClient(timeout=TIMEOUT, follow_redirects=True, headers=HEADERS, verify=False) as client:
-        try:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            html = resp.text
-        except Exception as e:
-            result["error"] = f"Failed to fetch {url}: {str(e)}"
-            return result
+    try:
+        resp = await site.get(url, timeout=TIMEOUT, headers=HEADERS, follow_redirects=True)
+        resp.raise_for_status()
+        html = resp.text
+    except Exception as e:
+        result["error"] = f"Failed to fetch {url}: {str(e)}"
+        return result
 
     # Strategy 1: Detect Stockist embed
     stockist_match = re.search(r'stockist\.co/api/v1/(\w+)', html)
     if stockist_match:
         account_id = stockist_match.group(1)
-        dealers = await _scrape_stockist(account_id)
+        dealers = await _scrape_stockist(account_id, api)
         if dealers:
             result["dealers"] = dealers
             result["strategy"] = "stockist"
@@ -166,7 +299,7 @@ async def scrape_dealers(url: str, brand: str = "") -> dict:
     storerocket_match = re.search(r'storerocket\.io/api/user/([a-zA-Z0-9]+)', html)
     if storerocket_match:
         user_id = storerocket_match.group(1)
-        dealers = await _scrape_storerocket(user_id)
+        dealers = await _scrape_storerocket(user_id, api)
         if dealers:
             result["dealers"] = dealers
             result["strategy"] = "storerocket"
@@ -179,7 +312,7 @@ async def scrape_dealers(url: str, brand: str = "") -> dict:
     )
     if storepoint_match:
         sp_id = storepoint_match.group(1)
-        dealers = await _scrape_storepoint(sp_id)
+        dealers = await _scrape_storepoint(sp_id, api)
         if dealers:
             result["dealers"] = dealers
             result["strategy"] = "storepoint"
@@ -193,7 +326,7 @@ async def scrape_dealers(url: str, brand: str = "") -> dict:
         return result
 
     # Strategy 5: Use Claude to extract from HTML
-    dealers = _extract_with_claude(html, brand)
+    dealers = await _extract_with_claude(html, brand)
     if dealers:
         result["dealers"] = dealers
         result["strategy"] = "claude_extraction"
@@ -211,23 +344,129 @@ async def scrape_dealers(url: str, brand: str = "") -> dict:
 
 
 # ── Stockist scraper ──────────────────────────────────────────────────────────
-async def _scrape_stockist(account_id: str) -> list[dict]:
-    """Scrape all dealers from a Stockist account."""
-    dealers = []
-    # Query with US center, large radius to get all
+# Searches return at most this many locations; a cell that comes back full
+# is split into quarters and searched again
+STOCKIST_RESULT_CAP = int(os.environ.get("STOCKIST_RESULT_CAP", "100"))
+STOCKIST_CONCURRENCY = int(os.environ.get("STOCKIST_CONCURRENCY", "8"))
+STOCKIST_CELL = 5.0  # degrees, initial sweep grid
+STOCKIST_MIN_CELL = 0.02  # degrees (~2 km), cells this small are not split further
+# (south, west, north, east): contiguous US, Alaska, Hawaii
+US_REGIONS = [
+    (24.5, -125.0, 49.5, -66.5),
+    (51.0, -170.0, 71.5, -130.0),
+    (18.5, -160.5, 22.5, -154.5),
+]
+
+
+def _cell_radius_km(cell: tuple) -> float:
+    """Distance from a cell's center to its farthest corner, in km (a
+    search radius in miles would only cover more)."""
+    south, west, north, east = cell
+    lat1, lng1 = math.radians((south + north) / 2), math.radians((west + east) / 2)
+    lat2, lng2 = math.radians(south if abs(south) < abs(north) else north), math.radians(west)
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def _grid_cells(regions: list[tuple], size: float) -> list[tuple]:
+    cells = []
+    for south, west, north, east in regions:
+        lat = south
+        while lat < north:
+            lng = west
+            while lng < east:
+                cells.append((lat, lng, min(lat + size, north), min(lng + size, east)))
+                lng += size
+            lat += size
+    return cells
+
+
+def _quarters(cell: tuple) -> list[tuple]:
+    south, west, north, east = cell
+    mid_lat, mid_lng = (south + north) / 2, (west + east) / 2
+    return [
+        (south, west, mid_lat, mid_lng), (south, mid_lng, mid_lat, east),
+        (mid_lat, west, north, mid_lng), (mid_lat, mid_lng, north, east),
+    ]
+
+
+def _dedupe_stockist(locations: list[dict]) -> list[dict]:
+    """Drop repeats from overlapping searches, by Stockist ID and by
+    coordinates + name (for rows without an ID)."""
+    seen_ids, seen_points, unique = set(), set(), []
+    for loc in locations:
+        loc_id = loc.get("id")
+        try:
+            point = (round(float(loc.get("latitude")), 5), round(float(loc.get("longitude")), 5),
+                     (loc.get("name") or "").strip().lower())
+        except (TypeError, ValueError):
+            point = None
+        if (loc_id is not None and loc_id in seen_ids) or (point is not None and point in seen_points):
+            continue
+        if loc_id is not None:
+            seen_ids.add(loc_id)
+        if point is not None:
+            seen_points.add(point)
+        unique.append(loc)
+    return unique
+
+
+async def _stockist_search(client: httpx.AsyncClient, account_id: str,
+                           lat: float, lng: float, distance: float) -> list[dict]:
     url = f"https://stockist.co/api/v1/{account_id}/locations/search"
-    params = {"latitude": 39.8, "longitude": -98.5, "distance": 10000}
+    params = {"latitude": round(lat, 4), "longitude": round(lng, 4), "distance": math.ceil(distance)}
+    resp = await client.get(url, params=params, timeout=TIMEOUT, headers=HEADERS)
+    resp.raise_for_status()
+    return resp.json().get("locations", [])
 
-    async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS) as client:
+
+async def _scrape_stockist(account_id: str, client: httpx.AsyncClient | None = None,
+                           sweep: bool = True) -> list[dict]:
+    """Scrape all dealers from a Stockist account.
+
+    Starts with one continental-radius search. If that comes back at the
+    result cap (or fails) and sweep is on, tiles the US into a grid and
+    searches the cells concurrently, splitting any cell that is still
+    capped, then dedupes the overlapping results.
+    """
+    async with borrow_client(client) as client:
         try:
-            resp = await client.get(url, params=params)
-            data = resp.json()
-            for loc in data.get("locations", []):
-                dealers.append(_normalize_stockist(loc))
+            # Query with US center, large radius to get all
+            first = await _stockist_search(client, account_id, 39.8, -98.5, 10000)
         except Exception:
-            pass
+            first = None
+        if first is not None and (len(first) < STOCKIST_RESULT_CAP or not sweep):
+            return [_normalize_stockist(loc) for loc in first]
+        if not sweep:
+            return []
+
+        semaphore = asyncio.Semaphore(STOCKIST_CONCURRENCY)
+
+        async def search_cell(cell: tuple) -> list[dict]:
+            south, west, north, east = cell
+            locations = None
+            for _ in range(2):  # one retry, so a flaky cell doesn't leave a hole
+                try:
+                    async with semaphore:
+                        locations = await _stockist_search(
+                            client, account_id, (south + north) / 2, (west + east) / 2,
+                            _cell_radius_km(cell),
+                        )
+                    break
+                except Exception:
+                    continue
+            if locations is None:
+                return []
+            if len(locations) >= STOCKIST_RESULT_CAP and north - south > STOCKIST_MIN_CELL:
+                parts = await asyncio.gather(*(search_cell(q) for q in _quarters(cell)))
+                locations = locations + [loc for part in parts for loc in part]
+            return locations
 
-    return dealers
+        parts = await asyncio.gather(*(search_cell(c) for c in _grid_cells(US_REGIONS, STOCKIST_CELL)))
+
+    found = (first or []) + [loc for part in parts for loc in part]
+    return [_normalize_stockist(loc) for loc in _dedupe_stockist(found)]
 
 
 def _normalize_stockist(loc: dict) -> dict:
@@ -245,13 +484,13 @@ def _normalize_stockist(loc: dict) -> dict:
 
 
 # ── StoreRocket scraper ──────────────────────────────────────────────────────
-async def _scrape_storerocket(user_id: str) -> list[dict]:
+async def _scrape_storerocket(user_id: str, client: httpx.AsyncClient | None = None) -> list[dict]:
     dealers = []
     url = f"https://storerocket.io/api/user/{user_id}/locations"
 
-    async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS) as client:
+    async with borrow_client(client) as client:
         try:
-            resp = await client.get(url)
+            resp = await client.get(url, timeout=TIMEOUT, headers=HEADERS)
             data = resp.json()
             for loc in data.get("results", {}).get("locations", []):
                 dealers.append({
@@ -272,13 +511,13 @@ async def _scrape_storerocket(user_id: str) -> list[dict]:
 
 
 # ── Storepoint scraper ────────────────────────────────────────────────────────
-async def _scrape_storepoint(sp_id: str) -> list[dict]:
+async def _scrape_storepoint(sp_id: str, client: httpx.AsyncClient | None = None) -> list[dict]:
     dealers = []
     url = f"https://api.storepoint.co/v1/{sp_id}/locations"
 
-    async with httpx.AsyncClient(timeout=TIMEOUT, headers=HEADERS) as client:
+    async with borrow_client(client) as client:
         try:
-            resp = await client.get(url)
+            resp = await client.get(url, timeout=TIMEOUT, headers=HEADERS)
             data = resp.json()
             for loc in data.get("results", {}).get("locations", []):
                 # Storepoint puts full address in streetaddress as comma-separated
@@ -306,30 +545,148 @@ async def _scrape_storepoint(sp_id: str) -> list[dict]:
 
 
 # ── Inline JSON extraction ────────────────────────────────────────────────────
-def _extract_inline_json(html: str) -> list[dict]:
-    """Look for inline JSON location data in the HTML source."""
-    # Common patterns: var locations = [...], window.stores = [...], etc.
-    patterns = [
-        r'(?:locations|stores|dealers|markers|points)\s*[=:]\s*(\[[\s\S]*?\]);',
-        r'JSON\.parse\([\'"](\[.*?\])[\'"]\)',
-        r'"locations"\s*:\s*(\[[\s\S]*?\])\s*[,}]',
-        r'"stores"\s*:\s*(\[[\s\S]*?\])\s*[,}]',
-        r'"dealers"\s*:\s*(\[[\s\S]*?\])\s*[,}]',
-        r'"results"\s*:\s*(\[[\s\S]*?\])\s*[,}]',
-    ]
+# Where embedded location arrays start: `locations = [`, `stores: [`,
+# `"dealers": [`, ... and `JSON.parse('[...]')`. Candidates are tried by
+# rank (the order the old per-pattern regexes ran in), then page position.
+_INLINE_KEYS = ("locations", "stores", "dealers", "markers", "points", "results")
+_INLINE_RANK = {
+    ("bare", "locations"): 0, ("bare", "stores"): 0, ("bare", "dealers"): 0,
+    ("bare", "markers"): 0, ("bare", "points"): 0,
+    ("parse", None): 1,
+    ("quoted", "locations"): 2, ("quoted", "stores"): 3, ("quoted", "dealers"): 4,
+    ("quoted", "results"): 5,
+}
+_INLINE_TAIL_RE = re.compile(r'("?)\s*([=:])\s*\[')
+_JSON_PARSE_RE = re.compile(r'JSON\.parse\(\s*([\'"])')
+_BRACKET_RE = re.compile(r'[\[\]{}"\']')
+_STRING_RE = {
+    '"': re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S),
+    "'": re.compile(r"'[^'\\]*(?:\\.[^'\\]*)*'", re.S),
+}
+_JS_ESCAPE_RE = re.compile(r'\\(.)|"', re.S)
+
+
+def _match_bracket(text: str, start: int, pairs: dict) -> int | None:
+    """Index of the bracket closing the one at text[start], or None.
 
-    for pattern in patterns:
-        matches = re.findall(pattern, html)
-        for match in matches:
-            try:
-                data = json.loads(match)
-                if isinstance(data, list) and len(data) > 2:
-                    dealers = _normalize_json_locations(data)
-                    if dealers:
-                        return dealers
-            except (json.JSONDecodeError, ValueError):
+    Skips over quoted strings (with backslash escapes) and records every
+    pair it resolves in `pairs`, including brackets that can never close
+    (None), so no stretch of the page is walked twice.
+    """
+    if start in pairs:
+        return pairs[start]
+    stack = []
+    i = start
+    while True:
+        m = _BRACKET_RE.search(text, i)
+        if m is None:
+            break  # runs off the end
+        i = m.start()
+        ch = text[i]
+        if ch in "\"'":
+            string = _STRING_RE[ch].match(text, i)
+            if string is None:
+                break  # unterminated string
+            i = string.end()
+            continue
+        if ch in "[{":
+            if i in pairs:  # already-walked nested span
+                if pairs[i] is None:
+                    break
+                i = pairs[i] + 1
                 continue
+            stack.append(i)
+        else:
+            if not stack or text[stack[-1]] != ("[" if ch == "]" else "{"):
+                break  # unbalanced
+            pairs[stack.pop()] = i
+            if not stack:
+                return i
+        i += 1
+    for open_at in stack:
+        pairs[open_at] = None
+    return None
+
+
+def _json_escape(m: re.Match) -> str:
+    escaped = m.group(1)
+    if escaped is None:
+        return '\\"'  # bare " inside a single-quoted literal
+    return "'" if escaped == "'" else "\\" + escaped
+
+
+def _js_string_value(literal: str) -> str:
+    """Decode a quoted JS string literal (either quote style)."""
+    try:
+        return json.loads('"' + _JS_ESCAPE_RE.sub(_json_escape, literal[1:-1]) + '"')
+    except (json.JSONDecodeError, ValueError):
+        return literal[1:-1]
+
+
+def _inline_anchors(html: str) -> list[tuple]:
+    """(rank, position, kind, end) of every candidate, best first.
+
+    For key anchors `end` is just past the opening "["; for JSON.parse
+    it is just past the string literal's opening quote.
+    Bare keys may end a longer identifier (`store_locations = [`,
+    `window.__stores = [`), as with the old unanchored pattern.
+    """
+    anchors = []
+    for key in _INLINE_KEYS:
+        i = html.find(key)
+        while i != -1:
+            tail = _INLINE_TAIL_RE.match(html, i + len(key))
+            if tail:
+                if not tail.group(1):
+                    kind = "bare"
+                elif i and html[i - 1] == '"' and tail.group(2) == ":":
+                    kind = "quoted"
+                else:
+                    kind = None  # `all_locations": [`, not a key of ours
+                if kind:
+                    anchors.append((_INLINE_RANK.get((kind, key), 6), i, kind, tail.end()))
+            i = html.find(key, i + 1)
+    for m in _JSON_PARSE_RE.finditer(html):
+        anchors.append((_INLINE_RANK[("parse", None)], m.start(), "parse", m.end()))
+    anchors.sort()
+    return anchors
+
+
+def _inline_json_candidates(html: str):
+    """Yield the JSON text of each candidate location array, best first."""
+    pairs: dict = {}
+    for _, _, kind, end in _inline_anchors(html):
+        if kind == "parse":
+            literal = _STRING_RE[html[end - 1]].match(html, end - 1)
+            if literal:
+                value = _js_string_value(literal.group())
+                if value.lstrip().startswith("["):
+                    yield value
+                raw = literal.group()[1:-1]
+                if raw != value and raw.lstrip().startswith("["):
+                    yield raw
+            continue
+        close = _match_bracket(html, end - 1, pairs)
+        if close is not None:
+            yield html[end - 1:close + 1]
 
+
+def _extract_inline_json(html: str) -> list[dict]:
+    """Look for inline JSON location data in the HTML source.
+
+    A linear scan: candidate keys are located first, each array's extent
+    is found by walking balanced brackets, and only complete spans are
+    handed to json.loads.
+    """
+    for candidate in _inline_json_candidates(html):
+        try:
+            data = json.loads(candidate)
+        except (json.JSONDecodeError, ValueError):
+            continue
+        if isinstance(data, list) and len(data) > 2:
+            dealers = _normalize_json_locations(data)
+            if dealers:
+                return dealers
     return []
 
 
@@ -397,8 +754,11 @@ def _normalize_json_locations(locations: list) -> list[dict]:
 
 
 # ── Claude-based HTML extraction ──────────────────────────────────────────────
-def _extract_with_claude(html: str, brand: str) -> list[dict]:
-    """Use Claude to extract dealer info from HTML when other strategies fail."""
+async def _extract_with_claude(html: str, brand: str) -> list[dict]:
+    """Use Claude to extract dealer info from HTML when other strategies fail.
+
+    Gives up (returning []) after EXTRACT_LLM_TIMEOUT seconds.
+    """
     api_key = os.environ.get("ANTHROPIC_API_KEY", "")
     if not api_key:
         return []
@@ -417,24 +777,16 @@ def _extract_with_claude(html: str, brand: str) -> list[dict]:
         return []
 
     try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=api_key)
-        resp = client.messages.create(
-            model="claude-haiku-4-5-20251001",
+        raw = (await _llm_complete(
+            f"Extract all dealer/store locations from this {brand} dealer locator page text. "
+            "Return ONLY a JSON array of objects with these fields: "
+            "name, address, city, state, zip, phone, website. "
+            "If a field is not available, use empty string. "
+            "Return [] if no dealers found. No explanation, just the JSON array.\n\n"
+            f"Page text:\n{text}",
             max_tokens=4000,
-            messages=[{
-                "role": "user",
-                "content": (
-                    f"Extract all dealer/store locations from this {brand} dealer locator page text. "
-                    "Return ONLY a JSON array of objects with these fields: "
-                    "name, address, city, state, zip, phone, website. "
-                    "If a field is not available, use empty string. "
-                    "Return [] if no dealers found. No explanation, just the JSON array.\n\n"
-                    f"Page text:\n{text}"
-                ),
-            }],
-        )
-        raw = resp.content[0].text.strip()
+            timeout=EXTRACT_LLM_TIMEOUT,
+        )).strip()
         # Extract JSON array from response
         json_match = re.search(r'\[[\s\S]*\]', raw)
         if json_match:
@@ -472,6 +824,11 @@ _PHONE_RE = re.compile(r'\(?\d{3}\)?[\s.\-]?\d{3}[\s.\-]?\d{4}')
 _ZIP_RE = re.compile(r'\b\d{5}(?:-\d{4})?\b')
 _STATE_RE = re.compile(r'\b(' + '|'.join(_US_STATE_ABBREVS) + r')\b')
 
+_CONTAINER_TAGS = ("li", "article", "div")
+_CONTAINER_TEXT_MAX = 400
+# Strings get_text() counts inside these tags (no comments or templates)
+_TEXT_STRING_TYPES = (NavigableString, CData)
+
 def _extract_html_structure(html: str, base_url: str) -> list[dict]:
     """Try to extract dealers from HTML structure (tables, lists, divs)."""
     soup = BeautifulSoup(html, "lxml")
@@ -496,28 +853,75 @@ def _extract_html_structure(html: str, base_url: str) -> list[dict]:
 
     # Try repeated div/li/article with address-like content
     # Must find at least 3 with BOTH phone AND state to count
-    for container_tag in ["li", "article", "div"]:
-        elements = soup.find_all(container_tag)
+    texts = _container_texts(soup)
+    for container_tag in _CONTAINER_TAGS:
         candidates = []
-        for el in elements:
-            # Skip if element has too many children (likely a wrapper)
-            if len(el.find_all(container_tag)) > 3:
-                continue
-            text = el.get_text(separator=" ", strip=True)
-            if 40 < len(text) < 400:
-                has_phone = _PHONE_RE.search(text)
-                has_state = _STATE_RE.search(text)
-                has_zip = _ZIP_RE.search(text)
-                if has_phone and (has_state or has_zip):
-                    dealer = _parse_address_text(text)
-                    if dealer:
-                        candidates.append(dealer)
+        for text in texts[container_tag]:
+            has_phone = _PHONE_RE.search(text)
+            has_state = _STATE_RE.search(text)
+            has_zip = _ZIP_RE.search(text)
+            if has_phone and (has_state or has_zip):
+                dealer = _parse_address_text(text)
+                if dealer:
+                    candidates.append(dealer)
         if len(candidates) >= 3:
             return candidates
 
     return []
 
 
+def _container_texts(soup: BeautifulSoup) -> dict[str, list[str]]:
+    """Address-sized text of each li/article/div, per tag in document order.
+
+    Equivalent to calling el.find_all(tag) and el.get_text(" ", strip=True)
+    on every container, but done in one iterative post-order walk. Each
+    element passes its nested container counts and text length up to its
+    parent. Text is only assembled while it is shorter than
+    _CONTAINER_TEXT_MAX, so the walk is linear in the size of the page.
+    Wrappers holding more than 3 containers of their own tag are skipped.
+    """
+    found: dict[str, list] = {tag: [] for tag in _CONTAINER_TAGS}
+    # Frame: [element, preorder index, child iterator, nested container
+    # counts, text length, text parts (None once too long)]
+    stack = [[soup, 0, iter(soup.contents), [0] * len(_CONTAINER_TAGS), 0, []]]
+    order = 0
+    while stack:
+        frame = stack[-1]
+        for child in frame[2]:
+            if isinstance(child, Tag):
+                order += 1
+                stack.append([child, order, iter(child.contents), [0] * len(_CONTAINER_TAGS), 0, []])
+                break
+            if type(child) in _TEXT_STRING_TYPES:
+                text = child.strip()
+                if text:
+                    _add_text(frame, len(text), [text])
+        else:
+            el, pre, _, counts, length, parts = stack.pop()
+            slot = _CONTAINER_TAGS.index(el.name) if el.name in _CONTAINER_TAGS else -1
+            if slot >= 0 and counts[slot] <= 3 and 40 < length < _CONTAINER_TEXT_MAX:
+                found[el.name].append((pre, " ".join(parts)))
+            if stack:
+                parent = stack[-1]
+                for i, n in enumerate(counts):
+                    parent[3][i] += n
+                if slot >= 0:
+                    parent[3][slot] += 1
+                if length:
+                    _add_text(parent, length, parts)
+    return {tag: [text for _, text in sorted(items)] for tag, items in found.items()}
+
+
+def _add_text(frame: list, length: int, parts: list | None):
+    """Append a run of text (joined with " ") to a frame of _container_texts."""
+    frame[4] += length + (1 if frame[4] else 0)
+    if frame[5] is not None:
+        if parts is None or frame[4] >= _CONTAINER_TEXT_MAX:
+            frame[5] = None
+        else:
+            frame[5].extend(parts)
+
+
 def _parse_address_text(text: str) -> dict | None:
     """Parse a block of text into a dealer record."""
     phone_match = _PHONE_RE.search(text)
@@ -542,35 +946,138 @@ def _parse_address_text(text: str) -> dict | None:
     }
 
 
+# ── Result cache ──────────────────────────────────────────────────────────────
+# Finished lookups, keyed per URL or brand (same {"timestamp", "data"} store
+# as the enrichment cache, in its own database file)
+_result_cache: EnrichmentCache | None = None
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _get_result_cache() -> EnrichmentCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = EnrichmentCache(DEALER_CACHE_DB)
+    return _result_cache
+
+
+def _result_key(brand: str, url: str) -> str:
+    if url:
+        return "url:" + url.strip()
+    return "brand:" + " ".join(brand.lower().split())
+
+
+def _cached_result(key: str) -> dict | None:
+    entry = _get_result_cache().get(key)
+    if entry is None:
+        return None
+    ttl = DEALER_CACHE_TTL if entry["data"].get("dealers") else DEALER_ERROR_TTL
+    if time.time() - entry["timestamp"] >= ttl:
+        return None
+    return entry["data"]
+
+
 # ── Main orchestrator ─────────────────────────────────────────────────────────
-async def find_brand_dealers(query: str = "", brand: str = "", url: str = "") -> dict:
+async def find_brand_dealers(
+    query: str = "",
+    brand: str = "",
+    url: str = "",
+    client: httpx.AsyncClient | None = None,
+    refresh: bool = False,
+) -> dict:
     """Main entry point. Accepts natural language query, brand name, or direct URL.
-    Returns {brand, dealers, source_url, strategy, count, error}.
+    Returns {brand, dealers, source_url, strategy, count, error, cached}.
+
+    Results are cached per URL (or per brand when no URL is given) for
+    DEALER_CACHE_TTL; refresh=True bypasses the cache. Concurrent lookups
+    of the same key share one in-flight scrape.
     """
     # Extract brand if only query provided
     if not brand and query:
-        brand = extract_brand_from_query(query)
+        brand = await extract_brand_from_query(query, refresh)
 
     if not brand and not url:
         return {"brand": "", "dealers": [], "source_url": "", "strategy": "none",
-                "count": 0, "error": "Could not determine brand name from query."}
-
+                "count": 0, "error": "Could not determine brand name from query.", "cached": False}
+
+    key = _result_key(brand, url)
+    if not refresh:
+        cached = _cached_result(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    task = _inflight.get(key)
+    if task is None:
+        def done(t: asyncio.Task):
+            _inflight.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # retrieved here so lookups every caller left aren't logged as unhandled
+
+        task = asyncio.create_task(_find_brand_dealers_uncached(key, brand, url, client))
+        _inflight[key] = task
+        task.add_done_callback(done)
+    # Shielded so one caller going away doesn't cancel the scrape for the others
+    result = await asyncio.shield(task)
+    return {**result, "cached": False}
+
+
+async def _find_brand_dealers_uncached(key: str, brand: str, url: str,
+                                       client: httpx.AsyncClient | None) -> dict:
     # Find dealer locator URL if not provided
     if not url:
-        url, loc_type = await find_dealer_locator(brand)
+        url, loc_type = await find_dealer_locator(brand, client)
 
     if not url:
-        return {"brand": brand, "dealers": [], "source_url": "", "strategy": "none",
-                "count": 0, "error": f"Could not find a dealer locator for '{brand}'. "
-                "Try pasting the dealer locator URL directly."}
+        result = {"brand": brand, "dealers": [], "source_url": "", "strategy": "none",
+                  "count": 0, "error": f"Could not find a dealer locator for '{brand}'. "
+                  "Try pasting the dealer locator URL directly."}
+        _get_result_cache().set(key, result)
+        return result
 
     # Scrape dealers
-    result = await scrape_dealers(url, brand)
-    return {
+    scraped = await scrape_dealers(url, brand, client)
+    result = {
         "brand": brand,
-        "dealers": result["dealers"],
-        "source_url": result["source_url"],
-        "strategy": result["strategy"],
-        "count": len(result["dealers"]),
-        "error": result["error"],
+        "dealers": scraped["dealers"],
+        "source_url": scraped["source_url"],
+        "strategy": scraped["strategy"],
+        "count": len(scraped["dealers"]),
+        "error": scraped["error"],
     }
+    _get_result_cache().set(key, result)
+    return result
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+def _bench_pages() -> dict:
+    """Synthetic locator pages: a large page with the data after a few MB of
+    unrelated scripts, one full of keys whose arrays never close, and small
+    pages whose key ends a longer identifier."""
+    dealers = json.dumps([
+        {"name": f"Shop {i} [\"{i}\"];", "address": f"{i} Main St", "city": "Austin",
+         "state": "TX", "lat": 30 + i / 1e4, "lng": -97 - i / 1e4}
+        for i in range(5000)
+    ])
+    noise = "".join(
+        f'<script>var cfg{i} = {{"a": [1, 2], "b": "it\'s"}};</script><p>Don\'t [stop]</p>'
+        for i in range(40000)
+    )
+    few = json.dumps(json.loads(dealers)[:4])
+    return {
+        "large": f"{noise}<script>var markers = {dealers};</script>",
+        "unclosed": "<script>" + "stores: [ {" * 20000 + "</script>",
+        # Keys at the end of a longer identifier
+        "store_locations": f"<script>var store_locations = {few};</script>",
+        "all_locations": f"<script>var all_locations = {few};</script>",
+        "window.__stores": f"<script>window.__stores = {few};</script>",
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    pages = {p: Path(p).read_text(errors="replace") for p in sys.argv[1:]} or _bench_pages()
+    for name, html in pages.items():
+        start = time.perf_counter()
+        found = _extract_inline_json(html)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(html) / 1e6:.1f} MB, {len(found)} dealers, {elapsed * 1000:.0f} ms")
@@ -0,0 +1,159 @@
+"""SQLite-backed persistent cache for store enrichment results."""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# SQLite's default limit on bound parameters per statement is 999
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment (
+    key       TEXT PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    data      TEXT NOT NULL,
+    pages     TEXT,
+    streak    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _entry(timestamp: float, data: str, streak: int) -> dict:
+    entry = {"timestamp": timestamp, "data": json.loads(data)}
+    if streak:
+        entry["streak"] = streak
+    return entry
+
+
+class EnrichmentCache:
+    """Keyed store of {"timestamp", "data"} entries, one row per store.
+
+    Entries have the same shape as the old enrichment_cache.json values so
+    callers can keep checking freshness against the entry timestamp. Entries
+    written with per-page fetch records (ETag, Last-Modified, content hash,
+    extracted fields) also carry them under "pages" for conditional refresh,
+    and entries with a non-zero "streak" (consecutive scrapes with the same
+    outcome, used for adaptive TTLs) carry that too.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(enrichment)")}
+        if "pages" not in columns:
+            self._conn.execute("ALTER TABLE enrichment ADD COLUMN pages TEXT")
+        if "streak" not in columns:
+            self._conn.execute("ALTER TABLE enrichment ADD COLUMN streak INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cache entry for key (including page records), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT timestamp, data, pages, streak FROM enrichment WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = _entry(row[0], row[1], row[3])
+        if row[2]:
+            entry["pages"] = json.loads(row[2])
+        return entry
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Return {key: entry} for every key that has a cached entry."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _MAX_PARAMS):
+                chunk = keys[i:i + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, timestamp, data, streak FROM enrichment WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, ts, data, streak in rows:
+                    found[key] = _entry(ts, data, streak)
+        return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM enrichment").fetchone()[0]
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+    def set(
+        self,
+        key: str,
+        data: dict,
+        timestamp: float | None = None,
+        pages: dict | None = None,
+        streak: int = 0,
+    ) -> dict:
+        """Insert or replace a single entry. Returns the stored entry."""
+        entry = {"timestamp": time.time() if timestamp is None else timestamp, "data": data}
+        if streak:
+            entry["streak"] = streak
+        if pages:
+            entry["pages"] = pages
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO enrichment (key, timestamp, data, pages, streak) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET timestamp = excluded.timestamp, "
+                "data = excluded.data, pages = excluded.pages, streak = excluded.streak",
+                (key, entry["timestamp"], json.dumps(data), json.dumps(pages) if pages else None, streak),
+            )
+            self._conn.commit()
+        return entry
+
+    # ── Migration ─────────────────────────────────────────────────────────────
+    def migrate_from_json(self, json_path: Path) -> int:
+        """Import entries from the legacy enrichment_cache.json, once.
+
+        Returns the number of entries imported (0 if already migrated or the
+        file is missing/unreadable). Existing rows are never overwritten.
+        """
+        json_path = Path(json_path)
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'json_migrated'"
+            ).fetchone()
+        if done or not json_path.exists():
+            return 0
+
+        try:
+            legacy = json.loads(json_path.read_text())
+        except (json.JSONDecodeError, OSError):
+            return 0
+
+        rows = [
+            (key, entry.get("timestamp", 0), json.dumps(entry.get("data", {})))
+            for key, entry in legacy.items()
+            if isinstance(entry, dict)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO enrichment (key, timestamp, data) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('json_migrated', ?)",
+                (str(time.time()),),
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,112 @@
+"""Per-host politeness scheduler for batch scraping."""
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+PER_HOST_CONCURRENT = int(os.environ.get("SCRAPE_PER_HOST", "2"))
+PER_HOST_INTERVAL = float(os.environ.get("SCRAPE_HOST_INTERVAL", "1.0"))  # seconds between starts
+
+
+def host_key(website: str) -> str:
+    """Normalized host for politeness limits ("https://www.x.com/a" -> "x.com")."""
+    if not website:
+        return ""
+    if not website.startswith("http"):
+        website = "https://" + website
+    host = urlparse(website).netloc.lower().split("@")[-1].split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+class _HostState:
+    def __init__(self, per_host: int):
+        self.slots = asyncio.Semaphore(per_host)
+        self.pace = asyncio.Lock()
+        self.next_start = 0.0
+        self.queued = 0
+        self.active = 0
+
+
+class HostScheduler:
+    """Runs jobs under a global concurrency limit plus per-host limits.
+
+    Each host gets at most per_host jobs in flight and at least min_interval
+    seconds between job starts. A job waits for its host's turn *before*
+    taking a global slot, so a throttled or slow host never holds up work
+    for other hosts — the effective order is reshuffled around it.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        per_host: int = PER_HOST_CONCURRENT,
+        min_interval: float = PER_HOST_INTERVAL,
+    ):
+        self._global = asyncio.Semaphore(max_concurrent)
+        self.per_host = max(1, per_host)
+        self.min_interval = min_interval
+        self._hosts: Dict[str, _HostState] = {}
+
+    @asynccontextmanager
+    async def _slot(self, limit: Optional[asyncio.Semaphore]):
+        if limit is None:
+            async with self._global:
+                yield
+        else:
+            async with limit, self._global:
+                yield
+
+    async def run(
+        self,
+        host: str,
+        fn: Callable[..., Awaitable[Any]],
+        *args,
+        limit: Optional[asyncio.Semaphore] = None,
+        **kwargs,
+    ) -> Any:
+        """Await fn(*args, **kwargs) once host and global limits allow.
+
+        limit is an extra caller-side semaphore (e.g. one batch's own
+        concurrency), taken together with the global slot once the host's
+        turn has come. An empty host (no website) skips the host limits.
+        """
+        if not host:
+            async with self._slot(limit):
+                return await fn(*args, **kwargs)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.per_host)
+        state.queued += 1
+        waiting = True
+        try:
+            async with state.slots:
+                if self.min_interval > 0:
+                    async with state.pace:
+                        loop = asyncio.get_running_loop()
+                        delay = state.next_start - loop.time()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        state.next_start = loop.time() + self.min_interval
+                async with self._slot(limit):
+                    state.queued -= 1
+                    waiting = False
+                    state.active += 1
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        state.active -= 1
+        finally:
+            if waiting:
+                state.queued -= 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Per-host queue depth for busy hosts: {host: {"queued": n, "active": m}}."""
+        return {
+            host: {"queued": st.queued, "active": st.active}
+            for host, st in self._hosts.items()
+            if st.queued or st.active
+        }
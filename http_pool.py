@@ -0,0 +1,156 @@
+"""Shared, lifecycle-managed httpx client pool for outbound HTTP."""
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "40"))
+MAX_PER_HOST = int(os.environ.get("HTTP_MAX_PER_HOST", "6"))
+KEEPALIVE_EXPIRY = 30.0
+HTTP2 = os.environ.get("HTTP2", "1") not in ("0", "false", "")
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ── Per-host connection limiting ──────────────────────────────────────────────
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body stream that releases the host slot once closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport so at most max_per_host requests per host are in flight.
+
+    A slot is held from sending the request until its response body is closed.
+    Semaphores are shared between all transports of one HttpPool.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, semaphores: Dict[str, asyncio.Semaphore], max_per_host: int):
+        self._inner = inner
+        self._semaphores = semaphores
+        self._max_per_host = max_per_host
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(host)
+        if sem is None:
+            sem = self._semaphores[host] = asyncio.Semaphore(self._max_per_host)
+        return sem
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        sem = self._semaphore(request.url.host)
+        await sem.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                sem.release()
+
+        try:
+            resp = await self._inner.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=resp.status_code,
+            headers=resp.headers,
+            stream=_ReleasingStream(resp.stream, release),
+            extensions=resp.extensions,
+        )
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+# ── Pool ──────────────────────────────────────────────────────────────────────
+class HttpPool:
+    """Owns long-lived AsyncClients so requests reuse TLS sessions and keep-alive.
+
+    One client per TLS-verification mode (store sites are fetched with
+    verify=False, APIs with verification on); both share the per-host limits.
+    Callers pass timeout/headers/follow_redirects per request.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive: int = MAX_KEEPALIVE,
+        max_per_host: int = MAX_PER_HOST,
+        http2: bool = HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.max_per_host = max_per_host
+        self.http2 = http2 and _http2_available()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._clients: Dict[bool, httpx.AsyncClient] = {}
+
+    def client(self, verify: bool = True) -> httpx.AsyncClient:
+        """Return the shared client for the given TLS-verification mode."""
+        client = self._clients.get(verify)
+        if client is None:
+            inner = httpx.AsyncHTTPTransport(verify=verify, http2=self.http2, limits=self.limits)
+            client = httpx.AsyncClient(
+                transport=_HostLimitedTransport(inner, self._semaphores, self.max_per_host),
+            )
+            self._clients[verify] = client
+        return client
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+# ── Process-wide pool (set by the FastAPI app lifespan) ──────────────────────
+_pool: Optional[HttpPool] = None
+
+def get_pool() -> Optional[HttpPool]:
+    return _pool
+
+def set_pool(pool: Optional[HttpPool]):
+    global _pool
+    _pool = pool
+
+@asynccontextmanager
+async def borrow_client(client: httpx.AsyncClient | None = None, verify: bool = True) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield an injected client, else the shared pool's client, else a temporary one.
+
+    The temporary fallback keeps modules usable outside the server (CLI runs,
+    serverless handlers that call asyncio.run per request).
+    """
+    if client is not None:
+        yield client
+    elif _pool is not None:
+        yield _pool.client(verify=verify)
+    else:
+        async with httpx.AsyncClient(verify=verify) as tmp:
+            yield tmp
@@ -0,0 +1,151 @@
+"""lxml.html extraction engine — XPath fast path for the scraper extractors.
+
+Produces the same fields as the BeautifulSoup extractors in scraper.py by
+feeding lxml-selected nodes into the same shared helpers. Select it with
+scrape_store(..., engine="lxml") or EXTRACT_ENGINE=lxml.
+
+Run `python lxml_extract.py <dir-of-saved-pages>` to check parity with the
+BeautifulSoup engine over a corpus of saved .html files; tests/ runs it
+over the committed fixture pages in tests/fixtures/pages.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from scraper import (
+    DESCRIPTION_META,
+    _collect_images,
+    _description_from_contents,
+    _hours_from_sources,
+    _subpages_from_links,
+)
+
+# Strings under these tags are not page text (BeautifulSoup keeps them as
+# Script/Stylesheet/TemplateString/Ruby* and skips them in get_text)
+_NON_TEXT = ("script", "style", "template", "rt", "rp")
+_TEXT_FILTER = "[not(" + " or ".join(f"ancestor::{t}" for t in _NON_TEXT) + ")]"
+
+# ── Precompiled XPath ─────────────────────────────────────────────────────────
+_XP_TEXT = etree.XPath("//text()" + _TEXT_FILTER)
+_XP_NODE_TEXT = etree.XPath(".//text()" + _TEXT_FILTER)
+_XP_LINKS = etree.XPath("//a[@href]")
+_XP_LD_JSON = etree.XPath("//script[@type='application/ld+json']")
+_XP_IMGS = etree.XPath("//img[@src]")
+_XP_TIMES = etree.XPath("//time")
+_XP_META = {
+    "property": etree.XPath("(//meta[@property=$value])[1]"),
+    "name": etree.XPath("(//meta[@name=$value])[1]"),
+}
+
+
+def parse(html: str):
+    """Parse a page into an lxml document, or None for an empty document."""
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input with an XML encoding declaration
+        return lxml_html.document_fromstring(html.encode("utf-8"))
+    except etree.ParserError:
+        return None
+
+
+def _node_text(el) -> str:
+    """Equivalent of BeautifulSoup's el.get_text(strip=True)."""
+    return "".join(s.strip() for s in _XP_NODE_TEXT(el))
+
+
+def _meta_content(doc, attr: str, value: str) -> Optional[str]:
+    found = _XP_META[attr](doc, value=value)
+    return found[0].get("content") if found else None
+
+
+# ── Extractors (same outputs as scraper's BeautifulSoup versions) ─────────────
+def page_text(doc) -> str:
+    """Equivalent of soup.get_text(separator=" ", strip=True)."""
+    if doc is None:
+        return ""
+    return " ".join(s for s in (t.strip() for t in _XP_TEXT(doc)) if s)
+
+
+def _ld_jsons(doc) -> List[str]:
+    return [script.text or "" for script in _XP_LD_JSON(doc)]
+
+
+def find_subpages(doc, base_url: str) -> List[str]:
+    if doc is None:
+        return []
+    links = [(a.get("href"), _node_text(a)) for a in _XP_LINKS(doc)]
+    return _subpages_from_links(links, base_url)
+
+
+def extract_images(doc, base_url: str) -> List[str]:
+    if doc is None:
+        return []
+    return _collect_images(
+        base_url,
+        _meta_content(doc, "property", "og:image"),
+        _meta_content(doc, "name", "twitter:image"),
+        _ld_jsons(doc),
+        [
+            (img.get("src"), img.get("width", ""), img.get("height", ""), img.get("srcset", ""))
+            for img in _XP_IMGS(doc)
+        ],
+    )
+
+
+def extract_description(doc) -> Optional[str]:
+    if doc is None:
+        return None
+    return _description_from_contents(
+        [_meta_content(doc, attr, value) or "" for attr, value in DESCRIPTION_META]
+    )
+
+
+def extract_hours(doc) -> Optional[str]:
+    if doc is None:
+        return None
+    return _hours_from_sources(_ld_jsons(doc), [_node_text(t) for t in _XP_TIMES(doc)])
+
+
+# ── Parity check ──────────────────────────────────────────────────────────────
+def _run_engine(extract_page, html: str, base_url: str, engine: str):
+    """The engine's extract, or (exception type name, message) if it raised."""
+    try:
+        return extract_page(html, base_url, True, engine=engine)
+    except Exception as e:
+        return (type(e).__name__, str(e))
+
+
+def check_parity(paths: List[Path], base_url: str = "https://example.com/") -> List[str]:
+    """Run both engines over saved pages; return a description of each mismatch."""
+    from scraper import _extract_page
+
+    mismatches = []
+    for path in paths:
+        html = path.read_text(errors="replace")
+        expected = _run_engine(_extract_page, html, base_url, "bs4")
+        actual = _run_engine(_extract_page, html, base_url, "lxml")
+        if isinstance(expected, dict) and isinstance(actual, dict):
+            diff = [k for k in expected if expected[k] != actual.get(k)]
+        else:
+            # Engines must fail the same way: same exception type and message
+            diff = [] if expected == actual else ["exception"]
+        if diff:
+            mismatches.append(f"{path}: {', '.join(diff)}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python lxml_extract.py <dir-of-saved-pages>")
+    pages = sorted(Path(sys.argv[1]).rglob("*.htm*"))
+    problems = check_parity(pages)
+    for line in problems:
+        print(line)
+    print(f"{len(pages) - len(problems)}/{len(pages)} pages match")
+    sys.exit(1 if problems else 0)
@@ -1,17 +1,37 @@
 """Async website scraper for e-bike retailer enrichment."""
 from __future__ import annotations
 
+import os
 import re
+import hashlib
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
 from typing import Optional, List, Dict
 from urllib.parse import urljoin, urlparse
 
 import httpx
 from bs4 import BeautifulSoup
 
+from brand_matcher import BrandMatcher
+from host_scheduler import HostScheduler, host_key
+from http_pool import borrow_client
+
 # ── Configuration ─────────────────────────────────────────────────────────────
 TIMEOUT = 5.0
 MAX_CONCURRENT = 5
+# Scrapes in flight per process, across batches, enrichment streams and refreshes
+SCRAPE_MAX_CONCURRENT = int(os.environ.get("SCRAPE_MAX_CONCURRENT", "32"))
+# Processes used for HTML parsing/extraction; 0 parses inline on the event loop
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+# Pages larger than this are truncated; only the first MAX_PAGE_BYTES are parsed
+MAX_PAGE_BYTES = int(os.environ.get("MAX_PAGE_BYTES", 2 * 1024 * 1024))
+# Content types worth parsing; anything else (PDFs, images, ...) is skipped unread
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# HTML extraction engine: "bs4" (BeautifulSoup) or "lxml" (lxml_extract XPath fast path)
+EXTRACT_ENGINE = os.environ.get("EXTRACT_ENGINE", "bs4")
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
                   "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -38,7 +58,17 @@ KNOWN_BRANDS = [
     "Salsa", "Surly", "All City", "Brompton", "Dahon", "Tern",
     "Shimano", "Bosch", "Bafang", "Yamaha", "Brose",
 ]
-_brand_patterns = [(b, re.compile(re.escape(b), re.IGNORECASE)) for b in KNOWN_BRANDS]
+# Alternate spellings reported under one canonical name. Multi-word names
+# also match their joined/dashed forms ("Santa Cruz" -> "SantaCruz").
+BRAND_ALIASES = {
+    "RadPower": "Rad Power",
+    "SurRon": "Sur Ron",
+    "Super 73": "SUPER73",
+}
+# Optional extra brands: {"Canonical": ["alias", ...]} or ["Brand", ...]
+BRANDS_FILE = Path(__file__).parent / "brands.json"
+
+_brand_matcher = BrandMatcher.from_brands(KNOWN_BRANDS, BRAND_ALIASES, BRANDS_FILE)
 
 # ── Email extraction ──────────────────────────────────────────────────────────
 EMAIL_RE = re.compile(
@@ -77,12 +107,13 @@ def _valid_social(platform: str, handle: str) -> bool:
     return handle.lower() not in SOCIAL_NOISE and len(handle) > 1
 
 # ── Hours extraction ──────────────────────────────────────────────────────────
-def _extract_hours(soup: BeautifulSoup) -> str | None:
+def _hours_from_sources(ld_jsons: List[str], time_texts: List[str]) -> str | None:
+    """Opening hours from JSON-LD script bodies, else from <time> element texts."""
     # Try JSON-LD first
-    for script in soup.find_all("script", type="application/ld+json"):
+    for raw in ld_jsons:
         try:
             import json
-            data = json.loads(script.string or "")
+            data = json.loads(raw)
             if isinstance(data, list):
                 data = data[0]
             hours = data.get("openingHoursSpecification") or data.get("openingHours")
@@ -110,26 +141,34 @@ def _extract_hours(soup: BeautifulSoup) -> str | None:
             continue
 
     # Try <time> elements
-    times = soup.find_all("time")
-    if times:
-        parts = [t.get_text(strip=True) for t in times if t.get_text(strip=True)]
+    if time_texts:
+        parts = [t for t in time_texts if t]
         if parts:
             return "; ".join(parts[:7])
 
     return None
 
+def _extract_hours(soup: BeautifulSoup) -> str | None:
+    return _hours_from_sources(
+        [script.string or "" for script in soup.find_all("script", type="application/ld+json")],
+        [t.get_text(strip=True) for t in soup.find_all("time")],
+    )
+
 # ── Contact/owner extraction ──────────────────────────────────────────────────
 OWNER_PATTERNS = [
     re.compile(r'(?:owner|founded by|proprietor)[:\s]+([A-Z][a-z]+ [A-Z][a-z]+)', re.I),
     re.compile(r'(?:meet|about)\s+(?:the\s+)?(?:owner|team)[:\s]*([A-Z][a-z]+ [A-Z][a-z]+)', re.I),
 ]
 
-def _extract_contacts(text: str) -> str | None:
+def _owner_candidates(text: str) -> List[str | None]:
+    """First match of each OWNER_PATTERNS entry in text (None if no match).
+
+    Kept per pattern so pages can be merged with pattern priority intact."""
+    found = []
     for pattern in OWNER_PATTERNS:
         m = pattern.search(text)
-        if m:
-            return m.group(1).strip()
-    return None
+        found.append(m.group(1).strip() if m else None)
+    return found
 
 # ── Main scrape function ──────────────────────────────────────────────────────
 def _is_chain_domain(website: str) -> bool:
@@ -139,14 +178,14 @@ def _is_chain_domain(website: str) -> bool:
     except Exception:
         return False
 
-def _find_subpages(soup: BeautifulSoup, base_url: str) -> List[str]:
-    """Find about/contact page links."""
+def _subpages_from_links(links: List[tuple], base_url: str) -> List[str]:
+    """Pick up to two same-site about/contact URLs from (href, link_text) pairs."""
     targets = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"].lower()
-        text = a.get_text(strip=True).lower()
+    for raw_href, link_text in links:
+        href = raw_href.lower()
+        text = link_text.lower()
         if any(kw in href or kw in text for kw in ("about", "contact", "team", "our-story")):
-            full = urljoin(base_url, a["href"])
+            full = urljoin(base_url, raw_href)
             if urlparse(full).netloc == urlparse(base_url).netloc:
                 targets.append(full)
     # Deduplicate, max 2
@@ -159,8 +198,19 @@ def _find_subpages(soup: BeautifulSoup, base_url: str) -> List[str]:
             unique.append(t)
     return unique[:2]
 
-def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
-    """Extract meaningful images: og:image, twitter:image, logo, hero images."""
+def _find_subpages(soup: BeautifulSoup, base_url: str) -> List[str]:
+    """Find about/contact page links."""
+    links = [(a["href"], a.get_text(strip=True)) for a in soup.find_all("a", href=True)]
+    return _subpages_from_links(links, base_url)
+
+def _collect_images(
+    base_url: str,
+    og_image: str | None,
+    twitter_image: str | None,
+    ld_jsons: List[str],
+    imgs: List[tuple],
+) -> List[str]:
+    """Rank image URLs from meta tags, JSON-LD and (src, width, height, srcset) img tuples."""
     images = []
     seen = set()
 
@@ -178,20 +228,18 @@ def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
             images.append(abs_url)
 
     # og:image — highest priority
-    og = soup.find("meta", property="og:image")
-    if og and og.get("content"):
-        _add(og["content"])
+    if og_image:
+        _add(og_image)
 
     # twitter:image
-    tw = soup.find("meta", attrs={"name": "twitter:image"})
-    if tw and tw.get("content"):
-        _add(tw["content"])
+    if twitter_image:
+        _add(twitter_image)
 
     # JSON-LD image
-    for script in soup.find_all("script", type="application/ld+json"):
+    for raw in ld_jsons:
         try:
             import json as _json
-            ld = _json.loads(script.string or "")
+            ld = _json.loads(raw)
             if isinstance(ld, list):
                 ld = ld[0]
             for key in ("image", "logo", "photo"):
@@ -207,11 +255,8 @@ def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
             pass
 
     # Large <img> tags (likely hero/product images)
-    for img in soup.find_all("img", src=True):
-        src = img["src"]
+    for src, w, h, srcset in imgs:
         # Skip if obviously small
-        w = img.get("width", "")
-        h = img.get("height", "")
         try:
             if w and int(w) < 80:
                 continue
@@ -223,7 +268,6 @@ def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
         if any(x in low for x in ('logo', 'hero', 'banner', 'slide', 'feature', 'shop', 'store', 'bike', 'ebike')):
             _add(src)
         # Also grab srcset best image
-        srcset = img.get("srcset", "")
         if srcset:
             parts = [s.strip().split()[0] for s in srcset.split(",") if s.strip()]
             if parts:
@@ -231,8 +275,7 @@ def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
 
     # Fallback: first few meaningful images
     if len(images) < 3:
-        for img in soup.find_all("img", src=True)[:20]:
-            src = img["src"]
+        for src, _w, _h, _srcset in imgs[:20]:
             low = src.lower()
             if any(x in low for x in ('.svg', 'icon', 'pixel', '1x1', 'data:image', 'gravatar')):
                 continue
@@ -242,16 +285,217 @@ def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
 
     return images[:6]
 
+def _extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
+    """Extract meaningful images: og:image, twitter:image, logo, hero images."""
+    og = soup.find("meta", property="og:image")
+    tw = soup.find("meta", attrs={"name": "twitter:image"})
+    return _collect_images(
+        base_url,
+        og.get("content") if og else None,
+        tw.get("content") if tw else None,
+        [script.string or "" for script in soup.find_all("script", type="application/ld+json")],
+        [
+            (img["src"], img.get("width", ""), img.get("height", ""), img.get("srcset", ""))
+            for img in soup.find_all("img", src=True)
+        ],
+    )
+
+# Meta tags checked for a description, in priority order
+DESCRIPTION_META = [("property", "og:description"), ("name", "description"), ("name", "twitter:description")]
+
+def _description_from_contents(contents: List[str]) -> Optional[str]:
+    """First non-blank content of the first matching tag for each DESCRIPTION_META entry."""
+    for content in contents:
+        if content.strip():
+            return content.strip()[:300]
+    return None
+
 def _extract_description(soup: BeautifulSoup) -> Optional[str]:
     """Extract site description from meta tags."""
-    for attr in [{"property": "og:description"}, {"name": "description"}, {"name": "twitter:description"}]:
-        tag = soup.find("meta", attrs=attr)
-        if tag and tag.get("content", "").strip():
-            return tag["content"].strip()[:300]
-    return None
+    contents = []
+    for attr, value in DESCRIPTION_META:
+        tag = soup.find("meta", attrs={attr: value})
+        contents.append(tag.get("content", "") if tag else "")
+    return _description_from_contents(contents)
+
+def _extract_page(html: str, url: str, is_home: bool, engine: str | None = None) -> dict:
+    """Run every extractor over one page. The returned dict holds no HTML.
+
+    Homepage-only fields (subpages, images, description) are filled when
+    is_home is set. engine selects "bs4" or "lxml" (default EXTRACT_ENGINE).
+    """
+    if (engine or EXTRACT_ENGINE) == "lxml":
+        import lxml_extract
+        doc = lxml_extract.parse(html)
+        page_text = lxml_extract.page_text(doc)
+        store_hours = lxml_extract.extract_hours(doc)
+        if is_home:
+            home = (
+                lxml_extract.find_subpages(doc, url),
+                lxml_extract.extract_images(doc, url),
+                lxml_extract.extract_description(doc),
+            )
+    else:
+        soup = BeautifulSoup(html, "lxml")
+        page_text = soup.get_text(separator=" ", strip=True)
+        store_hours = _extract_hours(soup)
+        if is_home:
+            home = (_find_subpages(soup, url), _extract_images(soup, url), _extract_description(soup))
+
+    socials = {}
+    for platform, pattern in SOCIAL_PATTERNS.items():
+        for handle in pattern.findall(html):
+            if _valid_social(platform, handle):
+                socials[platform] = handle
+                break
 
-async def scrape_store(website: str, existing_email: str = "") -> dict:
-    """Scrape a single store website. Returns enrichment data dict."""
+    page = {
+        "emails": {e.lower() for e in EMAIL_RE.findall(html) if _valid_email(e)},
+        "socials": socials,
+        "brands": _brand_matcher.find(page_text),
+        "owners": _owner_candidates(page_text),
+        "store_hours": store_hours,
+        "subpages": [],
+        "images": [],
+        "description": None,
+    }
+    if is_home:
+        page["subpages"], page["images"], page["description"] = home
+    return page
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-]+)', re.I)
+
+def _extract_page_bytes(
+    content: bytes, encoding: str | None, url: str, is_home: bool, engine: str | None = None,
+) -> dict:
+    """Decode a raw response body and run _extract_page. Runs in parse workers.
+
+    Uses the charset from the Content-Type header, else a <meta charset>
+    near the top of the document, else UTF-8.
+    """
+    if not encoding:
+        m = _META_CHARSET_RE.search(content[:4096])
+        encoding = m.group(1).decode("ascii") if m else None
+    try:
+        html = content.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        html = content.decode("utf-8", errors="replace")
+    return _extract_page(html, url, is_home, engine)
+
+# ── Parse worker pool ─────────────────────────────────────────────────────────
+_parse_pool: ProcessPoolExecutor | None = None
+
+def _get_parse_pool() -> ProcessPoolExecutor | None:
+    global _parse_pool
+    if _parse_pool is None and PARSE_WORKERS > 0:
+        # spawn, not fork: the server process has live threads and sockets
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    """Stop the parse workers (called on server shutdown)."""
+    global _parse_pool
+    pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def _extract_off_loop(
+    content: bytes, encoding: str | None, url: str, is_home: bool, engine: str | None = None,
+) -> dict:
+    """Parse and extract a page in the worker pool so the event loop stays free."""
+    global _parse_pool
+    pool = _get_parse_pool()
+    if pool is None:
+        return _extract_page_bytes(content, encoding, url, is_home, engine)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, _extract_page_bytes, content, encoding, url, is_home, engine)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge page); start a fresh pool next time
+        if _parse_pool is pool:
+            _parse_pool = None
+        raise
+
+async def _fetch_page(
+    client: httpx.AsyncClient, url: str, previous: dict | None = None,
+) -> tuple[bytes | None, str | None, dict, str | None]:
+    """Stream one page, retrying once on timeout.
+
+    Returns (body, declared_charset, validators, error_status); decoding is
+    left to the parse workers. Non-HTML responses are abandoned after the
+    headers with status "skipped", and bodies are cut off at MAX_PAGE_BYTES.
+    With a previous page record the request is conditional, and a 304
+    answer comes back as status "not_modified" (without one, as "error").
+    """
+    headers = dict(HEADERS)
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    for attempt in range(2):  # retry once
+        try:
+            async with client.stream(
+                "GET", url, timeout=TIMEOUT, headers=headers, follow_redirects=True,
+            ) as resp:
+                if resp.status_code == 304:
+                    # Only an answer to a conditional request; unasked for, it's an error
+                    return None, None, {}, "not_modified" if previous else "error"
+                resp.raise_for_status()
+                validators = {
+                    "etag": resp.headers.get("etag"),
+                    "last_modified": resp.headers.get("last-modified"),
+                }
+                content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+                if content_type and content_type not in HTML_CONTENT_TYPES:
+                    return None, None, validators, "skipped"
+                chunks = []
+                size = 0
+                async for chunk in resp.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= MAX_PAGE_BYTES:
+                        break
+                return b"".join(chunks)[:MAX_PAGE_BYTES], resp.charset_encoding, validators, None
+        except httpx.TimeoutException:
+            if attempt == 0:
+                await asyncio.sleep(0.5)
+                continue
+            return None, None, {}, "timeout"
+        except Exception:
+            return None, None, {}, "error"
+    return None, None, {}, "error"
+
+# ── Page records (conditional refresh) ────────────────────────────────────────
+def _page_to_record(page: dict) -> dict:
+    """JSON-safe copy of a _extract_page result."""
+    return {**page, "emails": sorted(page["emails"]), "brands": sorted(page["brands"])}
+
+def _page_from_record(record: dict) -> dict:
+    return {**record, "emails": set(record["emails"]), "brands": set(record["brands"])}
+
+async def scrape_store(
+    website: str,
+    existing_email: str = "",
+    client: httpx.AsyncClient | None = None,
+    engine: str | None = None,
+    previous_pages: dict | None = None,
+) -> dict:
+    """Scrape a single store website. Returns enrichment data dict.
+
+    Uses the injected client, else the shared http_pool client. engine picks
+    the HTML extraction engine for this run ("bs4" or "lxml").
+
+    The result carries a "_pages" record ({url: {etag, last_modified, hash,
+    extract}}) for the caller to persist. Passing it back as previous_pages
+    on the next refresh makes requests conditional: pages answering 304 or
+    with an unchanged content hash reuse their stored extract unparsed.
+    """
+    engine = engine or EXTRACT_ENGINE
     result = {
         "emails": [],
         "instagram": None,
@@ -281,110 +525,114 @@ async def scrape_store(website: str, existing_email: str = "") -> dict:
     if not website.startswith("http"):
         website = "https://" + website
 
-    all_text = ""
-    all_html = ""
     pages_to_scrape = [website]
 
-    async with httpx.AsyncClient(
-        timeout=TIMEOUT,
-        follow_redirects=True,
-        headers=HEADERS,
-        verify=False,
-    ) as client:
-        for i, url in enumerate(pages_to_scrape):
-            for attempt in range(2):  # retry once
-                try:
-                    resp = await client.get(url)
-                    resp.raise_for_status()
-                    html = resp.text
-                    soup = BeautifulSoup(html, "lxml")
-                    result["pages_scraped"] += 1
-
-                    page_text = soup.get_text(separator=" ", strip=True)
-                    all_text += " " + page_text
-                    all_html += " " + html
-
-                    # Find subpages from homepage only
-                    if i == 0:
-                        subpages = _find_subpages(soup, url)
-                        pages_to_scrape.extend(subpages)
-                        # Extract images and description from homepage
-                        result["images"] = _extract_images(soup, url)
-                        result["description"] = _extract_description(soup)
-
-                    # Extract hours from every page
-                    if not result["store_hours"]:
-                        result["store_hours"] = _extract_hours(soup)
-
-                    break  # success, no retry
-                except httpx.TimeoutException:
-                    if attempt == 0:
-                        await asyncio.sleep(0.5)
-                        continue
-                    result["status"] = "timeout"
-                except httpx.HTTPStatusError:
-                    result["status"] = "error"
-                    break
-                except Exception:
-                    result["status"] = "error"
-                    break
-
-    # Extract emails from all pages combined
+    previous_pages = previous_pages or {}
+    page_records = {}
+
+    async def _fetch_and_extract(url: str, is_home: bool) -> tuple[dict | None, str | None]:
+        previous = previous_pages.get(url)
+        if previous and not previous.get("extract"):
+            previous = None
+        content, encoding, validators, error = await _fetch_page(client, url, previous)
+        if error == "not_modified":
+            page_records[url] = previous
+            return _page_from_record(previous["extract"]), None
+        if error:
+            return None, error
+
+        digest = hashlib.sha1(content).hexdigest()
+        if previous and previous.get("hash") == digest:
+            page_records[url] = {**previous, **validators}
+            return _page_from_record(previous["extract"]), None
+        try:
+            page = await _extract_off_loop(content, encoding, url, is_home, engine)
+        except Exception:
+            return None, "error"
+        page_records[url] = {**validators, "hash": digest, "extract": _page_to_record(page)}
+        return page, None
+
+    # Each page is reduced to its extracted fields as soon as it arrives, so
+    # its HTML can be dropped before the next page is processed
+    async with borrow_client(client, verify=False) as client:
+        home, error = await _fetch_and_extract(website, True)
+        if not error:
+            pages_to_scrape.extend(home["subpages"])
+            result["images"] = home["images"]
+            result["description"] = home["description"]
+
+        # Subpages are independent of each other: fetch them concurrently,
+        # then merge in link order so results stay deterministic
+        fetched = await asyncio.gather(*(_fetch_and_extract(url, False) for url in pages_to_scrape[1:]))
+
     found_emails = set()
-    for email in EMAIL_RE.findall(all_html):
-        if _valid_email(email):
-            found_emails.add(email.lower())
+    found_brands = set()
+    owners: List[str | None] = [None] * len(OWNER_PATTERNS)
+    skipped = 0
+    for page, error in [(home, error), *fetched]:
+        if error == "skipped":
+            # Non-HTML link (PDF, image, ...) — not a failure, just not a page
+            skipped += 1
+            continue
+        if error:
+            result["status"] = error
+            continue
+        result["pages_scraped"] += 1
+        found_emails |= page["emails"]
+        found_brands |= page["brands"]
+        for platform, handle in page["socials"].items():
+            if not result[platform]:
+                result[platform] = f"https://{platform}.com/{handle}" if platform != "twitter" else f"https://x.com/{handle}"
+        if not result["store_hours"]:
+            result["store_hours"] = page["store_hours"]
+        owners = [o or c for o, c in zip(owners, page["owners"])]
+
     if existing_email:
         found_emails.discard(existing_email.lower().split(";")[0].strip())
     result["emails"] = sorted(found_emails)
-
-    # Extract socials from all HTML
-    for platform, pattern in SOCIAL_PATTERNS.items():
-        matches = pattern.findall(all_html)
-        for handle in matches:
-            if _valid_social(platform, handle):
-                result[platform] = f"https://{platform}.com/{handle}" if platform != "twitter" else f"https://x.com/{handle}"
-                break
-
-    # Extract brands
-    found_brands = set()
-    for brand_name, pattern in _brand_patterns:
-        if pattern.search(all_text):
-            found_brands.add(brand_name)
     result["brands_carried"] = sorted(found_brands)
-
-    # Extract contacts
-    result["owner_contact"] = _extract_contacts(all_text)
+    result["owner_contact"] = next((o for o in owners if o), None)
+    result["_pages"] = page_records
 
     # Determine final status
     if result["pages_scraped"] == 0:
         if result["status"] == "success":
             result["status"] = "error"
-    elif result["status"] == "success" and result["pages_scraped"] < len(pages_to_scrape):
+    elif result["status"] == "success" and result["pages_scraped"] < len(pages_to_scrape) - skipped:
         result["status"] = "partial"
 
     return result
 
 # ── Batch scraping with concurrency control ───────────────────────────────────
+# One per process, so per-host limits and pacing hold across every caller
+scrape_scheduler = HostScheduler(SCRAPE_MAX_CONCURRENT)
 _semaphore = asyncio.Semaphore(MAX_CONCURRENT)
 
-async def _scrape_with_semaphore(website: str, existing_email: str = "") -> dict:
-    async with _semaphore:
-        return await scrape_store(website, existing_email)
-
-async def scrape_batch(stores: List[Dict], callback=None) -> List[Dict]:
-    """Scrape a batch of stores. callback(index, store, result) called per completion."""
-    tasks = []
-    for store in stores:
-        tasks.append(_scrape_with_semaphore(
+async def scrape_batch(
+    stores: List[Dict],
+    callback=None,
+    client: httpx.AsyncClient | None = None,
+    engine: str | None = None,
+) -> List[Dict]:
+    """Scrape a batch of stores. callback(index, store, result) called per completion.
+
+    Stores are scheduled per host on the shared scrape_scheduler (see
+    host_scheduler) so chains sharing a domain are paced instead of
+    hammered, while other hosts keep going. Batches together run at most
+    MAX_CONCURRENT scrapes.
+    """
+    tasks = [
+        scrape_scheduler.run(
+            host_key(store.get("website", "")),
+            scrape_store,
             store.get("website", ""),
             store.get("email", ""),
-        ))
-
-    results = []
-    for i, coro in enumerate(asyncio.as_completed(tasks)):
-        # as_completed doesn't preserve order, so we use gather instead
-        pass
+            client,
+            engine,
+            limit=_semaphore,
+        )
+        for store in stores
+    ]
 
     # Use gather to preserve order
     results = await asyncio.gather(*tasks)
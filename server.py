@@ -7,51 +7,249 @@ load_dotenv()
 import hashlib
 import time
 import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from sse_starlette.sse import EventSourceResponse
 import uvicorn
 
-from scraper import scrape_store
+from scraper import scrape_store, scrape_scheduler, shutdown_parse_pool, MAX_CONCURRENT
 from airtable_export import export_to_airtable
 from dealer_scraper import find_brand_dealers
+from enrichment_cache import EnrichmentCache
+from store_table import StoreTable
+from status_index import StatusIndex
+from store_search import AUTOCOMPLETE_FIELDS, StoreAutocomplete, StoreSearchIndex
+from store_linkage import StoreLinker
+from http_pool import HttpPool, set_pool
+from host_scheduler import host_key
 
 # ── Setup ─────────────────────────────────────────────────────────────────────
 BASE_DIR = Path(__file__).parent
-CACHE_FILE = BASE_DIR / "enrichment_cache.json"
+CACHE_FILE = BASE_DIR / "enrichment_cache.json"  # legacy, migrated into CACHE_DB
+CACHE_DB = BASE_DIR / "enrichment_cache.db"
 TAGS_FILE = BASE_DIR / "tags.json"
 DATA_FILE = BASE_DIR / "data.json"
 INDEX_FILE = BASE_DIR / "index.html"
 LISTS_FILE = BASE_DIR / "lists.html"
-CACHE_TTL = 30 * 24 * 3600  # 30 days
+CACHE_TTL = 30 * 24 * 3600  # 30 days, first successful scrape
+CACHE_TTL_MAX = 180 * 24 * 3600  # successes that keep coming back unchanged
+RETRY_BACKOFF = 3600  # first retry after a failed scrape, doubling per failure
+RETRY_BACKOFF_MAX = 7 * 24 * 3600
+# Outcomes that depend only on the store record (name/website, i.e. the
+# cache key), so they stay valid until the record itself changes
+PERMANENT_STATUSES = {"no_website", "chain_skip"}
+SUCCESS_STATUSES = {"success", "partial"}
+ENRICH_CONCURRENCY = int(os.environ.get("ENRICH_CONCURRENCY", MAX_CONCURRENT))
+ENRICH_MAX_CONCURRENCY = 32
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Opened here rather than at import: the parse workers (spawn) re-import
+    # this module as __mp_main__ under `python server.py`, and must not each
+    # open the cache and run the migration
+    global _cache, _status
+    _cache = EnrichmentCache(CACHE_DB)
+    _cache.migrate_from_json(CACHE_FILE)
+    # Badge summaries per _idx, patched by _cache_result
+    _status = StatusIndex(_cache, _stores, lambda entry: entry.get("timestamp", 0) + _cache_ttl(entry))
+
+    # One pooled HTTP client layer shared by scraper, dealer_scraper and airtable_export
+    pool = HttpPool()
+    app.state.http_pool = pool
+    set_pool(pool)
+    # Build the store indexes in the background so first requests find them ready
+    _search.warm()
+    _autocomplete.warm()
+    _linker.warm()
+    try:
+        yield
+    finally:
+        set_pool(None)
+        await pool.aclose()
+        shutdown_parse_pool()
 
-app = FastAPI(title="E-Bike Directory Server")
+app = FastAPI(title="E-Bike Directory Server", lifespan=lifespan)
 
 # ── Cache management ──────────────────────────────────────────────────────────
-def _load_cache() -> dict:
-    if CACHE_FILE.exists():
-        try:
-            return json.loads(CACHE_FILE.read_text())
-        except (json.JSONDecodeError, OSError):
-            return {}
-    return {}
-
-def _save_cache(cache: dict):
-    CACHE_FILE.write_text(json.dumps(cache, indent=2))
+_cache: EnrichmentCache | None = None  # opened in lifespan
+_status: StatusIndex | None = None
 
 def _cache_key(name: str, website: str) -> str:
     raw = f"{name}|{website}".lower().strip()
     return hashlib.md5(raw.encode()).hexdigest()
 
+def _cache_ttl(entry: dict) -> float:
+    """Seconds an entry stays fresh, from its status and streak.
+
+    - no_website / chain_skip: forever (a changed record gets a new key)
+    - success: CACHE_TTL, doubled for each re-scrape that found nothing new
+    - partial: CACHE_TTL
+    - anything else (error, timeout, ...), including good data kept through
+      a failed refresh: RETRY_BACKOFF, doubled per consecutive failure
+    """
+    data = entry.get("data", {})
+    status = data.get("status")
+    streak = min(entry.get("streak", 0), 16)
+    if _is_failure(data):
+        return min(RETRY_BACKOFF * 2 ** streak, RETRY_BACKOFF_MAX)
+    if status in PERMANENT_STATUSES:
+        return float("inf")
+    if status == "success":
+        return min(CACHE_TTL * 2 ** streak, CACHE_TTL_MAX)
+    return CACHE_TTL
+
 def _is_cache_valid(entry: dict) -> bool:
-    return time.time() - entry.get("timestamp", 0) < CACHE_TTL
+    return time.time() - entry.get("timestamp", 0) < _cache_ttl(entry)
+
+def _is_failure(data: dict) -> bool:
+    """Whether cached data records a failed scrape (or a failed refresh of good data)."""
+    return bool(data.get("refresh_error")) or data.get("status") not in SUCCESS_STATUSES | PERMANENT_STATUSES
+
+def _same_outcome(previous: dict, data: dict) -> bool:
+    """Whether a re-scrape repeated the previous outcome (for the TTL streak)."""
+    old = previous.get("data", {})
+    if _is_failure(data):
+        # Failures of any kind (error, timeout, ...) extend the failure streak
+        return _is_failure(old)
+    if data.get("status") == "success":
+        ignore = ("pages_scraped",)
+        return old.get("status") == "success" and not _is_failure(old) and all(
+            old.get(k) == v for k, v in data.items() if k not in ignore
+        )
+    return False
+
+def _cache_result(key: str, result: dict, previous: dict | None = None) -> dict:
+    """Cache a scrape_store result, keeping its page records out of the data.
+
+    previous is the entry being replaced; repeating its outcome extends the
+    streak that _cache_ttl scales the entry's lifetime by. A failed refresh
+    of success/partial data keeps that data (marked with "refresh_error")
+    and its page records, so only the retry backoff moves on.
+    """
+    pages = result.pop("_pages", None)
+    data = result
+    old = previous.get("data", {}) if previous else {}
+    if _is_failure(result) and old.get("status") in SUCCESS_STATUSES:
+        data = {**old, "refresh_error": result.get("status", "error")}
+        pages = previous.get("pages")
+    streak = previous.get("streak", 0) + 1 if previous and _same_outcome(previous, data) else 0
+    entry = _cache.set(key, data, pages=pages, streak=streak)
+    _status.update(key, entry)
+    return entry
+
+# ── Scrape deduplication ──────────────────────────────────────────────────────
+_scrape_tasks: dict[str, asyncio.Task] = {}
+# Scrape tasks started by an enrichment stream that are still waiting for
+# their host and no one else has asked for; the stream drops them on disconnect
+_droppable: set[asyncio.Task] = set()
+
+def _scrape_task(
+    key: str,
+    store: dict,
+    entry: dict | None,
+    engine: str | None = None,
+    limit: asyncio.Semaphore | None = None,
+    droppable: bool = False,
+) -> asyncio.Task:
+    """Return the in-flight scrape for a store, starting one if needed.
+
+    The task waits for the store's host on the shared scrape_scheduler
+    (limit is the starting caller's own concurrency cap), scrapes
+    (conditionally, when an expired entry has page records), caches the
+    result and returns it. Callers await it through asyncio.shield so a
+    disconnecting client never cancels a scrape that others share.
+    """
+    task = _scrape_tasks.get(key)
+    if task is not None:
+        _droppable.discard(task)  # wanted by another caller now
+        return task
+
+    async def scrape() -> dict:
+        _droppable.discard(asyncio.current_task())  # host's turn came; no longer queued
+        return await scrape_store(
+            store.get("website", ""), store.get("email", ""), engine=engine,
+            previous_pages=entry.get("pages") if entry else None,
+        )
+
+    async def run() -> dict:
+        result = await scrape_scheduler.run(host_key(store.get("website", "")), scrape, limit=limit)
+        _cache_result(key, result, entry)
+        return result
+
+    def done(t: asyncio.Task):
+        _scrape_tasks.pop(key, None)
+        _droppable.discard(t)
+        if not t.cancelled():
+            t.exception()  # retrieved here so background failures aren't logged as unhandled
+
+    task = asyncio.create_task(run())
+    task.add_done_callback(done)
+    _scrape_tasks[key] = task
+    if droppable:
+        _droppable.add(task)
+    return task
+
+def _drop_queued(tasks) -> None:
+    """Cancel the droppable scrapes among tasks (those still waiting for their host)."""
+    for task in tasks:
+        if task in _droppable:
+            _droppable.discard(task)
+            task.cancel()
+
+# ── Store data ────────────────────────────────────────────────────────────────
+_stores = StoreTable(DATA_FILE, _cache_key)
 
 def _load_data() -> list[dict]:
-    if DATA_FILE.exists():
-        return json.loads(DATA_FILE.read_text())
-    return []
+    """Return the in-memory store list (reloaded only when data.json changes)."""
+    return _stores.stores
+
+class _StoreIndex:
+    """A structure built from the store list, rebuilt when data.json changes.
+
+    Builds run in a worker thread so a large rebuild doesn't stall the event
+    loop (and the SSE streams on it); concurrent callers share one build.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._version: int | None = None
+        self._index = None
+        self._pending: tuple[int, asyncio.Future] | None = None
+
+    def _start(self) -> tuple[int, asyncio.Future]:
+        """The build for the current data.json, started unless one is running
+        or succeeded (a failed build is retried)."""
+        stores, version = _stores.stores, _stores.version
+        pending = self._pending
+        if (pending is None or pending[0] != version
+                or pending[1].done() and (pending[1].cancelled() or pending[1].exception())):
+            future = asyncio.ensure_future(asyncio.to_thread(self._build, stores))
+            # Retrieved here so a failed build nobody awaits isn't logged as unhandled
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._pending = (version, future)
+        return self._pending
+
+    def warm(self):
+        """Start building for the current data.json without waiting for it."""
+        if _stores.version != self._version:
+            self._start()
+
+    async def get(self):
+        """The index for the current data.json, waiting for its build if needed."""
+        if _stores.version == self._version:
+            return self._index
+        version, future = self._start()
+        index = await asyncio.shield(future)
+        if self._version is None or version > self._version:
+            self._version, self._index = version, index
+        return index
+
+_search = _StoreIndex(StoreSearchIndex)
+_autocomplete = _StoreIndex(StoreAutocomplete)
+_linker = _StoreIndex(StoreLinker)
 
 # ── Routes ────────────────────────────────────────────────────────────────────
 @app.get("/")
@@ -66,116 +264,177 @@ async def serve_lists():
 async def serve_data():
     return FileResponse(DATA_FILE, media_type="application/json")
 
-@app.get("/api/enrichment-status")
-async def enrichment_status():
-    """Return which store indices have cached enrichment data."""
-    cache = _load_cache()
+@app.get("/api/autocomplete")
+async def autocomplete(q: str = "", limit: int = 10, format: str = ""):
+    """Search-as-you-type store lookup by name/city/state prefix, best score first.
+
+    format=compact returns {"fields": [...], "rows": [[...], ...]} instead
+    of a list of objects.
+    """
+    limit = max(0, min(limit, 50))
+    index = await _autocomplete.get()
     data = _load_data()
-    enriched = {}
-    for i, store in enumerate(data):
-        key = _cache_key(store.get("name", ""), store.get("website", ""))
-        if key in cache and _is_cache_valid(cache[key]):
-            entry = cache[key]
-            enriched[str(i)] = {
-                "status": entry.get("data", {}).get("status", "unknown"),
-                "email_count": len(entry.get("data", {}).get("emails", [])),
-                "has_socials": any(
-                    entry.get("data", {}).get(p)
-                    for p in ("instagram", "facebook", "twitter", "youtube", "tiktok", "linkedin")
-                ),
-                "brand_count": len(entry.get("data", {}).get("brands_carried", [])),
-            }
-    return JSONResponse(enriched)
+    rows = [
+        [i, *(data[i].get(f) for f in AUTOCOMPLETE_FIELDS[1:])]
+        for i in index.complete(q, limit)
+    ]
+    if format == "compact":
+        return JSONResponse({"fields": AUTOCOMPLETE_FIELDS, "rows": rows})
+    return JSONResponse({"stores": [dict(zip(AUTOCOMPLETE_FIELDS, row)) for row in rows]})
+
+@app.get("/api/enrichment-status")
+async def enrichment_status(request: Request, since: int | None = None):
+    """Return which store indices have cached enrichment data.
+
+    Without `since`: the full {idx: summary} map, with an ETag (304 when
+    unchanged) and the index version in X-Status-Version.
+    With `since=<version>`: {"version", "full", "changes"}, where changes
+    holds only stores whose summary changed after that version (null when
+    it was removed), or everything if full is true.
+    """
+    if since is not None:
+        version, full, changes = _status.changes_since(since)
+        return JSONResponse({"version": version, "full": full, "changes": changes})
+
+    version, enriched = _status.snapshot()
+    headers = {"ETag": f'"{version}"', "X-Status-Version": str(version), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(enriched, headers=headers)
 
 @app.post("/api/enrich")
 async def enrich_stores(request: Request):
-    """Enrich selected stores via SSE stream."""
+    """Enrich selected stores via SSE stream.
+
+    Scrapes go through the process-wide host scheduler (a few per domain
+    with a minimum gap between starts, shared with every other stream and
+    refresh), at most `concurrency` of this stream's at a time. Progress
+    events are emitted in completion order. Cached stores report
+    immediately.
+    Body: {store_indices: [...], concurrency?: int, engine?: "bs4" | "lxml"}
+    """
     body = await request.json()
     indices = body.get("store_indices", [])
+    try:
+        concurrency = int(body.get("concurrency") or ENRICH_CONCURRENCY)
+    except (TypeError, ValueError):
+        concurrency = ENRICH_CONCURRENCY  # not a number; use the default
+    concurrency = max(1, min(concurrency, ENRICH_MAX_CONCURRENCY))
+    engine = body.get("engine") if body.get("engine") in ("bs4", "lxml") else None
     data = _load_data()
-    cache = _load_cache()
+    keys = _stores.cache_keys
+    limit = asyncio.Semaphore(concurrency)
+    started: list[asyncio.Task] = []
+
+    async def enrich_one(store_idx: int, events: asyncio.Queue):
+        """Enrich one store, putting (is_final, payload) tuples on events."""
+        if store_idx < 0 or store_idx >= len(data):
+            await events.put((True, {
+                "index": store_idx, "name": "Unknown", "status": "error", "message": "Invalid index",
+            }))
+            return
+
+        store = data[store_idx]
+        name = store.get("name", "Unknown")
+        key = keys[store_idx]
+
+        # Check cache
+        entry = _cache.get(key)
+        if entry and _is_cache_valid(entry):
+            await events.put((True, {
+                "index": store_idx, "name": name, "status": "cached", "data": entry["data"],
+            }))
+            return
+
+        # Scrape, waiting for this store's host to be free
+        await events.put((False, {"index": store_idx, "name": name, "status": "scraping"}))
+        try:
+            task = _scrape_task(key, store, entry, engine, limit=limit, droppable=True)
+            started.append(task)
+            result = await asyncio.shield(task)
+            await events.put((True, {
+                "index": store_idx, "name": name, "status": result["status"], "data": result,
+            }))
+        except Exception as e:
+            await events.put((True, {
+                "index": store_idx, "name": name, "status": "error", "message": str(e),
+            }))
 
     async def event_generator():
         total = len(indices)
         yield {"event": "start", "data": json.dumps({"total": total})}
 
-        for progress_idx, store_idx in enumerate(indices):
-            if store_idx < 0 or store_idx >= len(data):
-                yield {"event": "progress", "data": json.dumps({
-                    "index": store_idx, "progress": progress_idx + 1, "total": total,
-                    "name": "Unknown", "status": "error", "message": "Invalid index",
-                })}
-                continue
-
-            store = data[store_idx]
-            name = store.get("name", "Unknown")
-            website = store.get("website", "")
-            key = _cache_key(name, website)
-
-            # Check cache
-            if key in cache and _is_cache_valid(cache[key]):
-                result = cache[key]["data"]
-                yield {"event": "progress", "data": json.dumps({
-                    "index": store_idx, "progress": progress_idx + 1, "total": total,
-                    "name": name, "status": "cached",
-                    "data": result,
-                })}
-                continue
-
-            # Scrape
-            yield {"event": "progress", "data": json.dumps({
-                "index": store_idx, "progress": progress_idx + 1, "total": total,
-                "name": name, "status": "scraping",
-            })}
+        events: asyncio.Queue = asyncio.Queue()
 
+        async def run_one(store_idx: int):
             try:
-                result = await scrape_store(website, store.get("email", ""))
-                # Cache result
-                cache[key] = {"timestamp": time.time(), "data": result}
-                _save_cache(cache)
-
-                yield {"event": "progress", "data": json.dumps({
-                    "index": store_idx, "progress": progress_idx + 1, "total": total,
-                    "name": name, "status": result["status"],
-                    "data": result,
-                })}
+                await enrich_one(store_idx, events)
             except Exception as e:
+                await events.put((True, {
+                    "index": store_idx, "name": "Unknown", "status": "error", "message": str(e),
+                }))
+
+        tasks = [asyncio.create_task(run_one(store_idx)) for store_idx in indices]
+        try:
+            completed = 0
+            while completed < total:
+                is_final, payload = await events.get()
+                if is_final:
+                    completed += 1
                 yield {"event": "progress", "data": json.dumps({
-                    "index": store_idx, "progress": progress_idx + 1, "total": total,
-                    "name": name, "status": "error", "message": str(e),
+                    "index": payload.pop("index"), "progress": completed, "total": total,
+                    **payload,
                 })}
+        finally:
+            # Client disconnected or stream finished — drop stores still waiting
+            # for their host (scrapes already running, or also wanted elsewhere,
+            # finish in the background and are cached)
+            for t in tasks:
+                t.cancel()
+            _drop_queued(started)
 
         yield {"event": "done", "data": json.dumps({"message": "Enrichment complete"})}
 
     return EventSourceResponse(event_generator())
 
+@app.get("/api/enrich/hosts")
+async def enrich_hosts():
+    """Per-host queue depth across all scrapes in this process."""
+    return {"hosts": scrape_scheduler.snapshot()}
+
 @app.get("/api/store/{idx}")
 async def store_detail(idx: int):
-    """Return full store data + cached enrichment. Triggers scrape if not cached."""
+    """Return full store data + cached enrichment.
+
+    Fresh entries are returned as-is. Expired entries are returned
+    immediately with "stale": true while a deduplicated background refresh
+    runs. Only stores never cached wait for a scrape.
+    """
     data = _load_data()
     if idx < 0 or idx >= len(data):
         return JSONResponse({"error": "Invalid index"}, status_code=404)
 
     store = data[idx]
-    cache = _load_cache()
-    key = _cache_key(store.get("name", ""), store.get("website", ""))
+    key = _stores.cache_key(idx)
 
     enrichment = None
-    if key in cache and _is_cache_valid(cache[key]):
-        enrichment = cache[key]["data"]
+    stale = False
+    entry = _cache.get(key)
+    if entry and _is_cache_valid(entry):
+        enrichment = entry["data"]
+    elif entry:
+        # Serve the expired entry now, refresh in the background
+        enrichment = entry["data"]
+        stale = True
+        _scrape_task(key, store, entry)
     else:
         # Auto-enrich on detail open
         try:
-            enrichment = await scrape_store(
-                store.get("website", ""),
-                store.get("email", ""),
-            )
-            cache[key] = {"timestamp": time.time(), "data": enrichment}
-            _save_cache(cache)
+            enrichment = await asyncio.shield(_scrape_task(key, store, entry))
         except Exception as e:
             enrichment = {"status": "error", "message": str(e)}
 
-    return JSONResponse({"store": store, "enrichment": enrichment})
+    return JSONResponse({"store": store, "enrichment": enrichment, "stale": stale})
 
 ## ── Tags persistence ─────────────────────────────────────────────────────────
 def _load_tags() -> dict:
@@ -208,19 +467,22 @@ async def export_airtable(request: Request):
     body = await request.json()
     indices = body.get("store_indices", [])
     data = _load_data()
-    cache = _load_cache()
 
     # Build stores list with enrichment data
     stores = []
-    enrichments = {}
+    keys = {}
     for idx in indices:
         if 0 <= idx < len(data):
             store = {**data[idx], "_idx": idx}
             stores.append(store)
-            # Attach enrichment if cached
-            key = _cache_key(store.get("name", ""), store.get("website", ""))
-            if key in cache and _is_cache_valid(cache[key]):
-                enrichments[idx] = cache[key]["data"]
+            keys[idx] = _stores.cache_key(idx)
+
+    # Attach enrichment if cached
+    cache = _cache.get_many(keys.values())
+    enrichments = {}
+    for idx, key in keys.items():
+        if key in cache and _is_cache_valid(cache[key]):
+            enrichments[idx] = cache[key]["data"]
 
     try:
         stats = await export_to_airtable(stores, enrichments)
@@ -231,14 +493,21 @@ async def export_airtable(request: Request):
 ## ── Dealer Finder API ────────────────────────────────────────────────────────
 @app.post("/api/dealer-finder")
 async def dealer_finder(request: Request):
-    """Find dealers for a brand via natural language query or direct URL."""
+    """Find dealers for a brand via natural language query or direct URL.
+
+    Each dealer is linked to the directory: "_idx" is the matching store's
+    _idx, or "new" if it isn't in data.json yet. Lookups are cached per
+    brand/URL; send "refresh": true to re-scrape.
+    """
     body = await request.json()
     query = body.get("query", "")
     brand = body.get("brand", "")
     url = body.get("url", "")
+    refresh = bool(body.get("refresh"))
 
     try:
-        result = await find_brand_dealers(query=query, brand=brand, url=url)
+        result = await find_brand_dealers(query=query, brand=brand, url=url, refresh=refresh)
+        (await _linker.get()).annotate(result["dealers"])
         return JSONResponse(result)
     except Exception as e:
         return JSONResponse(
@@ -336,21 +605,16 @@ async def lists_get(request: Request):
             return JSONResponse({"error": "Query must be at least 2 characters"}, status_code=400)
         data = _load_data()
         results = []
-        for i, store in enumerate(data):
-            if len(results) >= limit:
-                break
-            name = (store.get("name") or "").lower()
-            city = (store.get("city") or "").lower()
-            state = (store.get("state") or "").lower()
-            if q in name or q in city or q in state:
-                results.append({
-                    "idx": i,
-                    "name": store.get("name", ""),
-                    "city": store.get("city", ""),
-                    "state": store.get("state", ""),
-                    "rating": store.get("rating"),
-                    "store_type": store.get("store_type", ""),
-                })
+        for i in (await _search.get()).search(q, limit):
+            store = data[i]
+            results.append({
+                "idx": i,
+                "name": store.get("name", ""),
+                "city": store.get("city", ""),
+                "state": store.get("state", ""),
+                "rating": store.get("rating"),
+                "store_type": store.get("store_type", ""),
+            })
         return JSONResponse({"stores": results})
 
     return JSONResponse({"error": "Unknown action"}, status_code=400)
@@ -0,0 +1,158 @@
+"""Incrementally maintained, versioned enrichment-status index."""
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from enrichment_cache import EnrichmentCache
+from store_table import StoreTable
+
+SOCIAL_FIELDS = ("instagram", "facebook", "twitter", "youtube", "tiktok", "linkedin")
+
+
+def summarize(data: dict) -> dict:
+    """Per-store badge summary of an enrichment result."""
+    return {
+        "status": data.get("status", "unknown"),
+        "email_count": len(data.get("emails", [])),
+        "has_socials": any(data.get(p) for p in SOCIAL_FIELDS),
+        "brand_count": len(data.get("brands_carried", [])),
+    }
+
+
+class StatusIndex:
+    """Status summary per store _idx, kept current by cache writes.
+
+    The index is built once per data.json version (one get_many over the
+    precomputed cache keys) and then patched by update() whenever an entry
+    is written. Every change, including an entry expiring, bumps `version`
+    and records it against the store, so clients can ask for only what
+    changed since the version they last saw.
+
+    Versions start at the build time in milliseconds, so they keep
+    increasing across server restarts and a client's stale version is
+    recognized as predating the current build.
+    """
+
+    def __init__(
+        self,
+        cache: EnrichmentCache,
+        stores: StoreTable,
+        expires_at: Callable[[dict], float],
+    ):
+        self._cache = cache
+        self._stores = stores
+        self._expires_at = expires_at
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._idxs_by_key: Dict[str, List[int]] = {}
+        self._summaries: Dict[int, dict] = {}
+        self._changed: Dict[int, int] = {}  # _idx -> version of its last change
+        self._expires: Dict[int, float] = {}
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self._snapshot: Tuple[int, Dict[str, dict]] | None = None
+        self.version = int(time.time() * 1000)
+        self.base_version = self.version
+
+    # ── Maintenance ───────────────────────────────────────────────────────────
+    def _refresh(self):
+        with self._lock:
+            if self._stores.version != self._data_version:
+                self._rebuild()
+            self._expire(time.time())
+
+    def _rebuild(self):
+        stores = self._stores.stores
+        keys = self._stores.cache_keys
+        self._data_version = self._stores.version
+        self._idxs_by_key = {}
+        for i, (store, key) in enumerate(zip(stores, keys)):
+            self._idxs_by_key.setdefault(key, []).append(store.get("_idx", i))
+
+        self.version = max(self.version + 1, int(time.time() * 1000))
+        self.base_version = self.version
+        self._summaries = {}
+        self._changed = {}
+        self._expires = {}
+        self._expiry_heap = []
+        now = time.time()
+        for key, entry in self._cache.get_many(keys).items():
+            for idx in self._idxs_by_key[key]:
+                self._put(idx, entry, now)
+
+    def _put(self, idx: int, entry: dict, now: float) -> bool:
+        """Set idx's summary from entry (dropping it if expired); True if changed."""
+        expires = self._expires_at(entry)
+        summary = summarize(entry.get("data", {})) if expires > now else None
+        if summary is None:
+            self._expires.pop(idx, None)
+            return self._summaries.pop(idx, None) is not None
+
+        self._expires[idx] = expires
+        if not math.isinf(expires):
+            heapq.heappush(self._expiry_heap, (expires, idx))
+        if self._summaries.get(idx) == summary:
+            return False
+        self._summaries[idx] = summary
+        return True
+
+    def _expire(self, now: float):
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires, idx = heapq.heappop(heap)
+            # Skip heap items superseded by a later write
+            if self._expires.get(idx) == expires:
+                del self._expires[idx]
+                del self._summaries[idx]
+                self._mark(idx)
+
+    def _mark(self, idx: int):
+        self.version += 1
+        self._changed[idx] = self.version
+        self._snapshot = None
+
+    def update(self, key: str, entry: dict):
+        """Apply a freshly written cache entry to every store with that key."""
+        with self._lock:
+            if self._data_version is None:
+                return  # not built yet; the first build reads the cache
+            now = time.time()
+            for idx in self._idxs_by_key.get(key, ()):
+                if self._put(idx, entry, now):
+                    self._mark(idx)
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+    def snapshot(self) -> Tuple[int, Dict[str, dict]]:
+        """Return (version, {str(_idx): summary}) for all enriched stores."""
+        self._refresh()
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = (
+                    self.version,
+                    {str(idx): summary for idx, summary in sorted(self._summaries.items())},
+                )
+            return self._snapshot
+
+    def changes_since(self, since: int) -> Tuple[int, bool, Dict[str, Optional[dict]]]:
+        """Return (version, full, changes) relative to a previously seen version.
+
+        changes maps str(_idx) to its summary, or None if it no longer has
+        one. full is True when `since` predates the current build (data.json
+        changed or the server restarted) and changes is the whole index.
+        """
+        self._refresh()
+        with self._lock:
+            if since < self.base_version or since > self.version:
+                full = True
+                changes = {str(idx): summary for idx, summary in sorted(self._summaries.items())}
+            else:
+                full = False
+                changes = {
+                    str(idx): self._summaries.get(idx)
+                    for idx, v in sorted(self._changed.items())
+                    if v > since
+                }
+            return self.version, full, changes
@@ -0,0 +1,162 @@
+"""Record linkage between dealer-finder results and directory stores."""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from host_scheduler import host_key
+from store_search import normalize
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+MATCH_THRESHOLD = 0.5
+# Name tokens (and cities) shared by more stores than this are too common to
+# block on ("bike", "electric", ...); they still count towards the score
+BLOCK_MAX_DF = 40
+# A website domain shared by more stores than this is a chain or brand
+# site, not evidence that two records are the same location
+SHARED_DOMAIN_MIN = 3
+
+# Evidence weights, summed and capped at 1.0
+W_NAME = 0.45
+W_PHONE = 0.35
+W_ZIP = 0.15
+W_STREET_NO = 0.15
+W_DOMAIN = 0.15
+W_CITY = 0.10
+STREET_NO_MISMATCH = -0.10
+
+_NAME_STOPWORDS = {"the", "and", "of", "llc", "inc", "co", "company", "ltd", "shop", "store"}
+_ZIP_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+_STREET_NO_RE = re.compile(r"^\s*(\d+)\b")
+
+
+def normalize_phone(phone: str) -> str:
+    """Last 10 digits of a North American number, or "" if it isn't one."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits if len(digits) == 10 else ""
+
+
+def _zip(zip_code: str, address: str) -> str:
+    m = _ZIP_RE.match((zip_code or "").strip())
+    if m:
+        return m.group(1)
+    found = _ZIP_RE.findall(address or "")
+    return found[-1] if found else ""
+
+
+def _street_no(address: str) -> str:
+    m = _STREET_NO_RE.match(address or "")
+    return m.group(1) if m else ""
+
+
+def _name_tokens(name: str) -> frozenset:
+    return frozenset(t for t in normalize(name).split() if t not in _NAME_STOPWORDS)
+
+
+def _name_grams(name: str) -> frozenset:
+    compact = normalize(name).replace(" ", "")
+    return frozenset(compact[i:i + 3] for i in range(len(compact) - 2))
+
+
+def _dice(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class _Record:
+    """Normalized linkage fields of one store or dealer."""
+
+    __slots__ = ("tokens", "grams", "phone", "zip", "street_no", "city", "domain")
+
+    def __init__(self, rec: dict):
+        self.tokens = _name_tokens(rec.get("name", ""))
+        self.grams = _name_grams(rec.get("name", ""))
+        self.phone = normalize_phone(rec.get("phone", ""))
+        self.zip = _zip(rec.get("zip", ""), rec.get("address", ""))
+        self.street_no = _street_no(rec.get("address", ""))
+        self.city = normalize(rec.get("city", ""))
+        self.domain = host_key(rec.get("website", ""))
+
+
+def _score(a: _Record, b: _Record, shared_domains: set) -> float:
+    score = W_NAME * max(_dice(a.tokens, b.tokens), _dice(a.grams, b.grams))
+    if a.phone and a.phone == b.phone:
+        score += W_PHONE
+    if a.zip and a.zip == b.zip:
+        score += W_ZIP
+    if a.street_no and b.street_no:
+        score += W_STREET_NO if a.street_no == b.street_no else STREET_NO_MISMATCH
+    if a.domain and a.domain == b.domain and a.domain not in shared_domains:
+        score += W_DOMAIN
+    if a.city and a.city == b.city:
+        score += W_CITY
+    return min(score, 1.0)
+
+
+class StoreLinker:
+    """Links dealer records ({name, address, city, zip, phone, website, ...})
+    to directory stores.
+
+    Stores are indexed once into blocking keys: normalized phone, ZIP,
+    non-chain website domain, city and uncommon name tokens. A dealer is only scored
+    against stores sharing at least one key with it, so linking is roughly
+    linear in the number of dealers instead of dealers x stores.
+    """
+
+    def __init__(self, stores: List[dict]):
+        self._idx = [s.get("_idx", i) for i, s in enumerate(stores)]
+        self._records = [_Record(s) for s in stores]
+        self._blocks: Dict[Tuple[str, str], List[int]] = {}
+        for pos, rec in enumerate(self._records):
+            for key in self._keys(rec):
+                self._blocks.setdefault(key, []).append(pos)
+        self._shared_domains = {
+            k[1] for k, v in self._blocks.items() if k[0] == "domain" and len(v) > SHARED_DOMAIN_MIN
+        }
+        for key in [k for k, v in self._blocks.items() if k[0] in ("name", "city") and len(v) > BLOCK_MAX_DF]:
+            del self._blocks[key]
+        for domain in self._shared_domains:
+            del self._blocks[("domain", domain)]
+
+    @staticmethod
+    def _keys(rec: _Record):
+        if rec.phone:
+            yield ("phone", rec.phone)
+        if rec.zip:
+            yield ("zip", rec.zip)
+        if rec.domain:
+            yield ("domain", rec.domain)
+        if rec.city:
+            yield ("city", rec.city)
+        for token in rec.tokens:
+            if len(token) > 2:
+                yield ("name", token)
+
+    def _candidates(self, rec: _Record) -> set:
+        found = set()
+        for key in self._keys(rec):
+            found.update(self._blocks.get(key, ()))
+        return found
+
+    def link(self, dealer: dict) -> Tuple[Optional[int], float]:
+        """Return (_idx of the best matching store or None, its score)."""
+        rec = _Record(dealer)
+        best, best_score = None, 0.0
+        for pos in sorted(self._candidates(rec)):
+            score = _score(rec, self._records[pos], self._shared_domains)
+            if score > best_score:
+                best, best_score = pos, score
+        if best is None or best_score < MATCH_THRESHOLD:
+            return None, best_score
+        return self._idx[best], best_score
+
+    def annotate(self, dealers: Sequence[dict]) -> List[dict]:
+        """Set "_idx" (store _idx or "new") and "link_score" on each dealer."""
+        for dealer in dealers:
+            idx, score = self.link(dealer)
+            dealer["_idx"] = "new" if idx is None else idx
+            dealer["link_score"] = round(score, 3)
+        return list(dealers)
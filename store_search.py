@@ -0,0 +1,303 @@
+"""Store lookup indexes: trigram search (search_stores) and prefix autocomplete."""
+from __future__ import annotations
+
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+SEARCH_FIELDS = ("name", "city", "state", "address", "chain")
+
+# Fields are padded so every substring of two or more characters is covered
+# by some trigram, including the ends of the field
+_PAD = "\x01"
+
+
+def _trigrams(text: str) -> set:
+    padded = _PAD + text + _PAD
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_start(text: str, q: str) -> bool:
+    """Whether q occurs in text at the start of a word."""
+    i = text.find(q)
+    while i != -1:
+        if i == 0 or not text[i - 1].isalnum():
+            return True
+        i = text.find(q, i + 1)
+    return False
+
+
+def _quality(q: str, fields: Sequence[str]) -> Optional[int]:
+    """Match tier of q against one store's lowercased fields (lower is
+    better), or None if q is not a substring of any field."""
+    name, city, state, address, chain = fields
+    if q in name:
+        if name == q:
+            return 0
+        if name.startswith(q):
+            return 1
+        return 2 if _word_start(name, q) else 3
+    if q == city or q == state or q == chain:
+        return 4
+    if q in city or q in state or q in chain:
+        return 5
+    if q in address:
+        return 6
+    return None
+
+
+class _PrefixIndex:
+    """Sorted string keys, each tagged with a doc id (or rank).
+
+    A prefix is two binary searches to its key range; a min-segment-tree
+    over the ids then yields the ids in that range smallest first, one
+    per O(log n) step, so a caller that only wants the first few pays
+    for those alone. An id under several matching keys comes out once
+    per key, consecutively.
+    """
+
+    def __init__(self, entries: List[tuple], none: int):
+        """entries: (key, id) pairs, sorted; none: an id larger than any."""
+        self._keys = [key for key, _ in entries]
+        size = 1
+        while size < max(len(entries), 1):
+            size *= 2
+        tree = array("I", [none]) * (2 * size)
+        for j, (_, value) in enumerate(entries):
+            tree[size + j] = value
+        for node in range(size - 1, 0, -1):
+            tree[node] = min(tree[2 * node], tree[2 * node + 1])
+        self._size = size
+        self._tree = tree
+        self._none = none
+
+    def _cover(self, node: int, lo: int, hi: int, range_lo: int, range_hi: int) -> List[tuple]:
+        """Canonical (id, node, lo, hi) pieces covering [range_lo, range_hi)."""
+        if range_hi <= lo or hi <= range_lo:
+            return []
+        if range_lo <= lo and hi <= range_hi:
+            return [(self._tree[node], node, lo, hi)]
+        mid = (lo + hi) // 2
+        return (self._cover(2 * node, lo, mid, range_lo, range_hi)
+                + self._cover(2 * node + 1, mid, hi, range_lo, range_hi))
+
+    def ids(self, prefix: str) -> Iterator[int]:
+        """Lazily yield the ids of keys starting with prefix, smallest first."""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\U0010ffff")
+        if lo >= hi:
+            return
+        tree, none = self._tree, self._none
+        heap = self._cover(1, 0, self._size, lo, hi)
+        heapq.heapify(heap)
+        while heap:
+            value, node, nlo, nhi = heapq.heappop(heap)
+            if value == none:
+                return
+            if nhi - nlo == 1:
+                yield value
+                continue
+            mid = (nlo + nhi) // 2
+            heapq.heappush(heap, (tree[2 * node], 2 * node, nlo, mid))
+            heapq.heappush(heap, (tree[2 * node + 1], 2 * node + 1, mid, nhi))
+
+
+class _GramIndex:
+    """Trigram postings (doc ids ascending) over one group of fields."""
+
+    def __init__(self):
+        self._lists: Dict[str, list] = {}
+
+    def add(self, doc: int, texts: Sequence[str]):
+        grams = set()
+        for text in texts:
+            if text:
+                grams |= _trigrams(text)
+        for gram in grams:
+            self._lists.setdefault(gram, []).append(doc)
+
+    def freeze(self):
+        self._postings = {gram: array("I", docs) for gram, docs in self._lists.items()}
+        del self._lists
+        # Two-character queries: every trigram that starts with the pair
+        self._by_prefix: Dict[str, List[str]] = {}
+        for gram in self._postings:
+            self._by_prefix.setdefault(gram[:2], []).append(gram)
+
+    def candidates(self, q: str) -> Iterator[int]:
+        """Lazily yield docs containing every trigram of q, ascending."""
+        if len(q) == 2:
+            last = None
+            for doc in heapq.merge(*(self._postings[g] for g in self._by_prefix.get(q, ()))):
+                if doc != last:
+                    yield doc
+                    last = doc
+            return
+
+        lists = []
+        for i in range(len(q) - 2):
+            docs = self._postings.get(q[i:i + 3])
+            if docs is None:
+                return
+            lists.append(docs)
+        lists.sort(key=len)
+        rest = lists[1:4]
+        starts = [0] * len(rest)  # docs ascend, so each search resumes where the last ended
+        for doc in lists[0]:
+            for k, docs in enumerate(rest):
+                j = starts[k] = bisect_left(docs, doc, starts[k])
+                if j == len(docs) or docs[j] != doc:
+                    break
+            else:
+                yield doc
+
+
+class StoreSearchIndex:
+    """Substring search over SEARCH_FIELDS, ranked by match tier then score.
+
+    Documents are numbered in descending `score` order, so ties within a
+    tier break on doc id. Each tier has its own source yielding docs in
+    that order: exact names, name prefixes, names with a word starting
+    with the query, then trigram postings over names, exact
+    city/state/chain values, and trigram postings over city/state/chain
+    and over addresses. A query walks the tiers best first, verifies each
+    doc's tier with a real substring check and stops once it has `limit`
+    results, so popular queries cost about `limit` lookups rather than a
+    pass over every matching store.
+    """
+
+    def __init__(self, stores: List[dict]):
+        order = sorted(range(len(stores)), key=lambda i: (-(stores[i].get("score") or 0), i))
+        self._positions = array("I", order)
+        self._fields: List[tuple] = []
+        self._names: Dict[str, List[int]] = {}
+        self._values: Dict[str, List[int]] = {}  # city/state/chain
+        starts, word_starts = [], []
+        self._name_grams, self._other_grams, self._address_grams = _GramIndex(), _GramIndex(), _GramIndex()
+        for doc, i in enumerate(order):
+            store = stores[i]
+            fields = tuple((store.get(f) or "").lower() for f in SEARCH_FIELDS)
+            self._fields.append(fields)
+            name, city, state, address, chain = fields
+            if name:
+                self._names.setdefault(name, []).append(doc)
+                starts.append((name, doc))
+                word_starts.extend(
+                    (name[j:], doc) for j in range(1, len(name)) if not name[j - 1].isalnum()
+                )
+            for value in {city, state, chain} - {""}:
+                self._values.setdefault(value, []).append(doc)
+            self._name_grams.add(doc, (name,))
+            self._other_grams.add(doc, (city, state, chain))
+            self._address_grams.add(doc, (address,))
+
+        starts.sort()
+        word_starts.sort()
+        self._starts = _PrefixIndex(starts, len(order))
+        self._word_starts = _PrefixIndex(word_starts, len(order))
+        for grams in (self._name_grams, self._other_grams, self._address_grams):
+            grams.freeze()
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def _tier_sources(self, q: str) -> List[Iterable[int]]:
+        """Per _quality tier, an iterable of docs (ascending) that may be in it."""
+        return [
+            self._names.get(q, ()),
+            self._starts.ids(q),
+            self._word_starts.ids(q),
+            self._name_grams.candidates(q),
+            self._values.get(q, ()),
+            self._other_grams.candidates(q),
+            self._address_grams.candidates(q),
+        ]
+
+    def search(self, query: str, limit: int = 30) -> List[int]:
+        """Return store positions (indices into the stores list) matching
+        query, best first."""
+        q = query.lower().strip()
+        if len(q) < 2 or limit <= 0:
+            return []
+        fields = self._fields
+        results: List[int] = []
+        for tier, docs in enumerate(self._tier_sources(q)):
+            # A source also yields docs of better tiers (already taken, and
+            # fewer than limit of them) and, for trigrams, false positives
+            last = None
+            for doc in docs:
+                if doc != last and _quality(q, fields[doc]) == tier:
+                    results.append(self._positions[doc])
+                    if len(results) == limit:
+                        return results
+                last = doc
+        return results
+
+
+# ── Autocomplete ──────────────────────────────────────────────────────────────
+# Payload fields, in row order for format=compact
+AUTOCOMPLETE_FIELDS = ("idx", "name", "city", "state", "rating", "store_type")
+_MAX_WORD_SUFFIXES = 6  # "pedego dallas electric bikes" also completes from "dallas ...", ...
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+
+def _word_suffixes(text: str) -> List[str]:
+    words = text.split()
+    return [" ".join(words[i:]) for i in range(min(len(words), _MAX_WORD_SUFFIXES))]
+
+
+class StoreAutocomplete:
+    """Prefix completion over normalized store names, cities and states.
+
+    Every key (the name, and the name from each later word on; the city
+    likewise; the state) is stored once in a sorted array alongside the
+    store's score rank. A prefix is two binary searches to its key range;
+    a min-segment-tree over the ranks then yields the best-scored stores
+    in that range one by one, so a lookup is O(log n) plus O(log n) per
+    result, independent of how many keys share the prefix.
+    """
+
+    def __init__(self, stores: List[dict]):
+        order = sorted(range(len(stores)), key=lambda i: (-(stores[i].get("score") or 0), i))
+        self._positions = array("I", order)
+
+        entries = []
+        for rank, i in enumerate(order):
+            store = stores[i]
+            keys = set(_word_suffixes(normalize(store.get("name", ""))))
+            keys.update(_word_suffixes(normalize(store.get("city", ""))))
+            keys.add(normalize(store.get("state", "")))
+            keys.discard("")
+            entries.extend((key, rank) for key in keys)
+        entries.sort()
+        self._prefixes = _PrefixIndex(entries, len(order))
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def complete(self, query: str, limit: int = 10) -> List[int]:
+        """Return store positions whose name, city or state (or a later
+        word of them) starts with query, best score first."""
+        q = normalize(query)
+        if not q or limit <= 0:
+            return []
+        seen = set()
+        results = []
+        for rank in self._prefixes.ids(q):
+            # A store can sit under several keys with the same prefix
+            if rank not in seen:
+                seen.add(rank)
+                results.append(self._positions[rank])
+                if len(results) == limit:
+                    break
+        return results
@@ -0,0 +1,73 @@
+"""Process-wide in-memory table of directory stores loaded from data.json."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+class StoreTable:
+    """Parses data.json once and reloads only when the file changes.
+
+    Every access does a cheap os.stat(); the file is re-read only when its
+    mtime or size moves, and re-parsed only when its content hash differs.
+    Cache keys are precomputed per store with key_fn(name, website).
+    """
+
+    def __init__(self, path: Path, key_fn: Callable[[str, str], str]):
+        self.path = Path(path)
+        self._key_fn = key_fn
+        self._lock = threading.Lock()
+        self._stat = None
+        self._digest = ""
+        self._stores: List[dict] = []
+        self._keys: List[str] = []
+        self.version = 0
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            st = None
+        stamp = (st.st_mtime_ns, st.st_size) if st else None
+        if stamp == self._stat:
+            return
+
+        with self._lock:
+            if stamp == self._stat:
+                return
+            if stamp is None:
+                raw = b""
+            else:
+                raw = self.path.read_bytes()
+            digest = hashlib.sha1(raw).hexdigest()
+            if digest != self._digest:
+                stores = json.loads(raw) if raw else []
+                self._stores = stores
+                self._keys = [self._key_fn(s.get("name", ""), s.get("website", "")) for s in stores]
+                self._digest = digest
+                self.version += 1
+            self._stat = stamp
+
+    # ── Accessors ─────────────────────────────────────────────────────────────
+    @property
+    def stores(self) -> List[dict]:
+        """All stores in file order. Treat as read-only."""
+        self._refresh()
+        return self._stores
+
+    @property
+    def cache_keys(self) -> List[str]:
+        """Precomputed cache key per store, aligned with stores."""
+        self._refresh()
+        return self._keys
+
+    def cache_key(self, idx: int) -> Optional[str]:
+        """Return the precomputed cache key for the store at position idx."""
+        self._refresh()
+        if 0 <= idx < len(self._keys):
+            return self._keys[idx]
+        return None
@@ -0,0 +1,45 @@
+"""Local brand resolution for dealer-finder queries."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import dealer_scraper  # noqa: E402
+from enrichment_cache import EnrichmentCache  # noqa: E402
+
+
+@pytest.fixture
+def no_llm(monkeypatch, tmp_path):
+    """No API key, and a throwaway memo cache."""
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.setattr(dealer_scraper, "_result_cache", EnrichmentCache(tmp_path / "dealers.db"))
+
+
+@pytest.mark.parametrize("query, brand", [
+    ("pedgo dealers", "Pedego"),
+    ("rad powr bikes near me", "Rad Power"),
+    ("trk dealers", "Trek"),
+])
+def test_misspelled_brands_resolve(query, brand):
+    assert dealer_scraper._get_brand_resolver().resolve(query)[0] == brand
+
+
+def test_generic_words_do_not_fuzzy_match_brands(no_llm):
+    # "tire" is one letter off "trek" (ratio 0.75)
+    assert dealer_scraper._get_brand_resolver().resolve("fat tire bikes near me") == (None, 0.0)
+    brand = asyncio.run(dealer_scraper.extract_brand_from_query("fat tire bikes near me"))
+    assert brand == "fat tire"
+
+
+def test_memoized_llm_answer_expires_and_refreshes(no_llm):
+    query = "fat tire bikes near me"
+    key = "query:" + query
+    cache = dealer_scraper._get_result_cache()
+    cache.set(key, {"brand": "Wrong Brand"})
+    assert asyncio.run(dealer_scraper.extract_brand_from_query(query)) == "Wrong Brand"
+    assert asyncio.run(dealer_scraper.extract_brand_from_query(query, refresh=True)) == "fat tire"
+
+    cache.set(key, {"brand": "Wrong Brand"}, timestamp=0)  # older than DEALER_CACHE_TTL
+    assert asyncio.run(dealer_scraper.extract_brand_from_query(query)) == "fat tire"
@@ -0,0 +1,46 @@
+"""Parity of the lxml extraction engine with the BeautifulSoup one."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import scraper  # noqa: E402
+from lxml_extract import check_parity  # noqa: E402
+
+PAGES = sorted((Path(__file__).parent / "fixtures" / "pages").glob("*.html"))
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[p.stem for p in PAGES])
+def test_engines_match(page):
+    assert check_parity([page]) == []
+
+
+def test_fixtures_exercise_extractors():
+    """The corpus must keep covering what the lxml engine reimplements."""
+    found = {
+        p.stem: scraper._extract_page(p.read_text(), "https://example.com/", True, engine="bs4")
+        for p in PAGES
+    }
+    assert found["jsonld_hours"]["store_hours"] == "Mo-Fr 10:00-18:00; Sa 10:00-16:00"
+    assert found["time_tags"]["store_hours"].endswith("Sun closed")
+    assert "https://example.com/img/hero-1600.jpg" in found["srcset_images"]["images"]
+    assert found["meta_tags"]["description"].startswith("Lakeside Bike Co.")
+    assert "https://example.com/template-contact" in found["template_ruby"]["subpages"]
+
+
+def test_differing_exceptions_are_mismatches(monkeypatch, tmp_path):
+    page = tmp_path / "page.html"
+    page.write_text("<html></html>")
+
+    def fails(html, url, is_home, engine=None):
+        raise ValueError(f"{engine} failed")
+
+    monkeypatch.setattr(scraper, "_extract_page", fails)
+    assert check_parity([page]) == [f"{page}: exception"]
+
+    def fails_alike(html, url, is_home, engine=None):
+        raise ValueError("bad page")
+
+    monkeypatch.setattr(scraper, "_extract_page", fails_alike)
+    assert check_parity([page]) == []